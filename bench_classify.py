@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+# сравнение посимвольной классификации через token_map (Automaton.group_of)
+# с предварительной классификацией numpy (режим 'numpy')
+# на синтетическом входе для лексера lab1
+# использование: python bench_classify.py [размер входа в символах]
+
+import sys
+import time
+from packages.automata import Automaton
+from packages.lab1 import STTDispatcher
+
+DESCRIPTION = 'packages/lab1/c_stt.xml'
+SAMPLE = ('long double d[12][3], average_value;\n'
+          'short   s1 , s2[9];\n\tchar c;\n')
+
+
+def measure(f):
+    t = time.perf_counter()
+    r = f()
+    return r, time.perf_counter() - t
+
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 22
+text = (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+
+# только классификация символов
+A = Automaton(DESCRIPTION, mode='numpy')
+group_of = A.group_of
+_, t_map = measure(lambda: [group_of(ch) for ch in text])
+_, t_np = measure(lambda: A.classifier.classify(text))
+print(f'classify {len(text)} chars: token_map {t_map:.3f}s, numpy {t_np:.3f}s')
+
+# полный разбор с действиями и без них
+for name, make in (('no actions', Automaton.NilFunction),
+                   ('STTDispatcher', STTDispatcher)):
+    for mode in ('reference', 'table', 'numpy', 'generated'):
+        B = Automaton(DESCRIPTION, make(), mode=mode)
+        r, t = measure(lambda: B.parse(text))
+        print(f'parse [{name}] {mode}: {t:.3f}s ({r})')
+
+# пакетный разбор многих коротких строк без действий
+snippets = SAMPLE.splitlines() * (size // len(SAMPLE) + 1)
+C = Automaton(DESCRIPTION)
+r, t_loop = measure(lambda: [C.parse(x) for x in snippets])
+(accept, _), t_batch = measure(lambda: C.parse_batch(snippets))
+print(f'{len(snippets)} snippets: parse loop {t_loop:.3f}s, '
+      f'parse_batch {t_batch:.3f}s ({list(accept) == r})')
+
+# несколько автоматов над одним входом: по отдельности и за один проход
+group = lambda: [Automaton(DESCRIPTION, STTDispatcher()), Automaton(DESCRIPTION),
+                 Automaton('packages/lab1/c_scan.xml')]
+D = group()
+r, t_sep = measure(lambda: [A.parse(text) for A in D])
+M = group()
+r_many, t_many = measure(lambda: Automaton.parse_many(M, text))
+print(f'{len(M)} automata: separate {t_sep:.3f}s, parse_many {t_many:.3f}s ({r_many == r})')
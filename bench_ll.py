@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# сравнение разбора LL(1)-анализатором рекурсивного спуска,
+# сгенерированным по грамматике (GeneratedParser), и разбора
+# по скомпилированной таблице (GrammarParser.parse) с разбором
+# по строкам таблицы (parse_reference), выбирающим альтернативы
+# по отображениям направляющих символов (TableRow.predict)
+# либо перебором строк, а также выдачу событий разбора (iterparse),
+# на синтетическом входе для грамматики ll_grammar.txt
+# и на входе с глубоко вложенными пространствами имен;
+# проверяется, что стек iterparse не растет на длинном списке объявлений
+# использование: python bench_ll.py [число объявлений]
+
+import sys
+import time
+from packages.ll import GeneratedParser, GrammarParser, NestingError
+from packages.lab3 import LexDispatcher, SynDispatcher
+
+TYPES = ('int', 'unsigned long int', 'short', 'signed char', 'double',
+         'long double', 'bool', 'float', 'unsigned short int', 'long int')
+
+
+# число повторений замера (берется лучшее время)
+REPEAT = 3
+
+# глубина вложенности пространств имен
+# (больше предела сгенерированного анализатора, см. NestingError)
+DEPTH = 1200
+
+# число объявлений в одном пространстве имен для проверки стека iterparse
+FLAT = 100000
+
+# допустимая глубина стека iterparse на таком списке
+FLAT_PENDING = 64
+
+
+def measure(f):
+    best = None
+    for _ in range(REPEAT):
+        t = time.perf_counter()
+        r = f()
+        t = time.perf_counter() - t
+        best = t if best is None else min(best, t)
+    return r, best
+
+
+# текст из count объявлений функций в пространствах имен
+def program(count: int) -> str:
+    lines = []
+    for i in range(count):
+        if i % 50 == 0:
+            lines.append(f'namespace n{i} {{')
+        ret, a, b, c = (TYPES[(i * k + k) % len(TYPES)] for k in (1, 3, 7, 9))
+        lines.append(f'  {ret} f{i}({a} a, {b} b[][4], {c}, ...);')
+        if i % 50 == 49 or i == count - 1:
+            lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# текст из depth вложенных пространств имен
+def nested(depth: int) -> str:
+    return 'namespace a {\n' * depth + 'int f();\n' + '}\n' * depth
+
+
+# способы разбора: сгенерированным анализатором, по скомпилированной
+# таблице, по строкам таблицы с выбором альтернатив по отображениям
+# и перебором строк
+def variants(*args):
+    P = GeneratedParser(*args)
+    yield 'generated', P.parse
+    P = GrammarParser(*args)
+    yield 'compiled', P.parse
+    P = GrammarParser(*args)
+    yield 'predict', P.parse_reference
+    P = GrammarParser(*args)
+    for t in P.table:
+        t.predict = None
+    yield 'scan', P.parse_reference
+
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+text = program(count)
+
+L = LexDispatcher()
+for name, parse in variants('packages/lab3/lexg.txt', L):
+    r, t = measure(lambda: parse(text))
+    print(f'lex {len(text)} chars [{name}]: {t:.3f}s ({r})')
+stream = L.stream
+
+for disp in (None, SynDispatcher):
+    label = 'no actions' if disp is None else disp.__name__
+    args = ('ll_grammar.txt',) if disp is None else ('ll_grammar.txt', disp())
+    for name, parse in variants(*args):
+        r, t = measure(lambda: parse(stream))
+        print(f'parse {len(stream)} tokens [{label}] {name}: {t:.3f}s ({r})')
+
+P = GrammarParser('ll_grammar.txt')
+r, t = measure(lambda: sum(1 for _ in P.iterparse(stream)))
+print(f'iterparse {len(stream)} tokens: {t:.3f}s ({r} events)')
+
+# наибольшая глубина стека отложенных действий и концов нетерминалов
+L = LexDispatcher()
+GeneratedParser('packages/lab3/lexg.txt', L).parse('int f(int a);')
+stream = ['namespace', 'nkw', 'n', '{'] + L.stream * FLAT + ['}']
+events = P.iterparse(stream)
+pending = 0
+for _ in events:
+    pending = max(pending, len(events.gi_frame.f_locals['pending']))
+print(f'iterparse {FLAT} declarations in one namespace: '
+      f'pending stack depth {pending}')
+assert pending <= FLAT_PENDING, pending
+
+text = nested(DEPTH)
+L = LexDispatcher()
+GeneratedParser('packages/lab3/lexg.txt', L).parse(text)
+stream = L.stream
+for name, parse in variants('ll_grammar.txt', SynDispatcher()):
+    try:
+        r, t = measure(lambda: parse(stream))
+    except NestingError as e:
+        print(f'parse {DEPTH} nested namespaces {name}: {e}')
+        continue
+    print(f'parse {DEPTH} nested namespaces {name}: {t:.3f}s ({r})')
@@ -1,15 +1,17 @@
-from packages.ll import GrammarParser, GrammarParserException
+from packages.ll import GeneratedParser, GrammarParser, GrammarParserException, NestingError
 from packages.lab3 import LexDispatcher, SynDispatcher
+from packages.automata.lines import LineIndex
 from pathlib import Path
 
 
+# обход в глубину с явным стеком (дерево может быть глубже
+# предела рекурсии Python)
 def print_tree(t):
-    _print_tree(t, 0)
-
-def _print_tree(t, lv):
-    print(f'{"".join("- " for i in range(lv))}{t}')
-    for c in t.children:
-        _print_tree(c, lv+1)
+    stack = [(t, 0)]
+    while stack:
+        t, lv = stack.pop()
+        print(f'{"".join("- " for i in range(lv))}{t}')
+        stack.extend((c, lv+1) for c in reversed(t.children))
 
 with open('input.txt') as fp:
     s = fp.read()
@@ -17,25 +19,29 @@ with open('input.txt') as fp:
 with open('output.txt', 'w') as fp:
     L = LexDispatcher()
     try:
-        A = GrammarParser('packages/lab3/lexg.txt', L)
+        A = GeneratedParser('packages/lab3/lexg.txt', L)
         if A.parse(s):
             stream = L.stream
-            streampos = L.token_pos
-            streampos.append(L.last_char_pos)
             S = SynDispatcher()
-            B = GrammarParser('ll_grammar.txt', S)
-            if B.parse(stream):
+            try:
+                correct = GeneratedParser('ll_grammar.txt', S).parse(stream)
+            except NestingError:
+                # слишком глубокая вложенность: разбор по таблице
+                S = SynDispatcher()
+                correct = GrammarParser('ll_grammar.txt', S).parse(stream)
+            if correct:
                 fp.write('CORRECT\n')
             else:
                 err_tok = S.err_tok
-                err_pos = streampos[err_tok]
+                # строка и столбец вычисляются по смещению только при ошибке
+                err_pos = LineIndex(s).pos(L.stream_offset(err_tok))
                 print_tree(S.ns_stack[0])
                 if not S.duplicate:
                     fp.write(f'INCORRECT {err_pos[0]}:{err_pos[1]}\n')
                 else:
                     fp.write(f'DUPLICATE {S.duplicate} {err_pos[0]}:{err_pos[1]}')
         else:
-            err_pos = L.last_char_pos
+            err_pos = LineIndex(s).pos(L.last_char_offset)
             fp.write(f'INCORRECT {err_pos[0]}:{err_pos[1]}')
     except GrammarParserException as e:
         fp.write('NOT GRAMMAR\n')
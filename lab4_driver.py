@@ -1,5 +1,6 @@
 from packages.lr import GrammarParser, GrammarParserException
 from packages.lab4 import LexDispatcher, SynDispatcher
+from packages.automata.lines import LineIndex
 from pathlib import Path
 
 # вывести дерево элементов разбора (НС и функции)
@@ -20,8 +21,6 @@ with open('output.txt', 'w') as fp:
         A = GrammarParser('packages/lab4/lexg.txt', L)
         if A.parse(s):
             stream = L.stream
-            streampos = L.token_pos
-            streampos.append(L.last_char_pos)
             S = SynDispatcher()
             B = GrammarParser('lr_grammar.txt', S)
             if B.parse(stream):
@@ -29,7 +28,8 @@ with open('output.txt', 'w') as fp:
             else:
                 err_tok = S.err_tok
                 print(err_tok)
-                err_pos = streampos[err_tok]
+                # строка и столбец вычисляются по смещению только при ошибке
+                err_pos = LineIndex(s).pos(L.stream_offset(err_tok))
                 print(S.buffer)                
                 print_tree(S.ns_stack[0])
                 if not S.duplicate:
@@ -37,7 +37,7 @@ with open('output.txt', 'w') as fp:
                 else:
                     fp.write(f'DUPLICATE {S.duplicate} {err_pos[0]}:{err_pos[1]}')
         else:
-            err_pos = L.last_char_pos
+            err_pos = LineIndex(s).pos(L.last_char_offset)
             fp.write(f'INCORRECT {err_pos[0]}:{err_pos[1]}')
     except GrammarParserException as e:
         fp.write('NOT GRAMMAR\n')
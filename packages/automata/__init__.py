@@ -1,2 +1,4 @@
 from .automaton import Automaton
-from .dispatcher import AutomatonActionDispatcher
\ No newline at end of file
+from .dispatcher import AutomatonActionDispatcher, AutomatonRunDispatcher
+from .multi import MultiParser
+from .scan import ScanError
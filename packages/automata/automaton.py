@@ -1,6 +1,15 @@
 import xml.etree.ElementTree as xml
-from typing import Any, Dict, Set, Iterable, Iterator, Tuple
+from bisect import bisect_right
+from typing import Any, Dict, List, Set, Iterable, Iterator, Tuple, Optional
 from .dispatcher import AutomatonActionDispatcher
+from .table import CompiledTable
+from .classify import Classifier
+from .minimize import minimize
+from .nfa import determinize
+from .scan import scan
+from . import codegen, multi, parallel
+from .regex import recognizer
+from .source import is_buffer, iter_chars, incomplete_tail
 
 
 
@@ -14,8 +23,18 @@ class Automaton:
     # заведомо не может быть лексемой
     HALT = ''
     # тип данных "таблица переходов" для хинтов
-    # описание см. комментарий к Automaton.__parse_transitions
+    # описание см. комментарий к Automaton.__parse_transition
     TransitionTable = Dict[Tuple[str, str], Tuple[str, str]]
+    # режимы разбора
+    # table -- по скомпилированной таблице переходов (CompiledTable)
+    # reference -- по словарям, построенным из описания
+    # (эталонный режим, медленный)
+    # numpy -- по таблице переходов с предварительной классификацией
+    # всех символов строки средствами numpy (см. Classifier);
+    # потоки лексем, не являющиеся строками, разбираются как в table
+    # generated -- сгенерированным по описанию модулем Python
+    # (см. codegen), модуль кэшируется рядом с файлом описания
+    MODES = ('table', 'reference', 'numpy', 'generated')
 
     # обёртка, добавляющая в конец iterable символ конца последовательности
     class HaltIterable:
@@ -46,79 +65,126 @@ class Automaton:
         def reset(self) -> None:
             pass
 
-    # разобрать состояния в xml файле
-    # S -- кусок дерева xml, содержащий описания состояний:
+    # разобрать состояние в xml файле
+    # s -- кусок дерева, содержащий имя состояния:
+    # <s>state_name</s>
+    # необязательный атрибут kind помечает состояние как допускающее
+    # лексему вида kind при разбиении входа на лексемы (см. scan):
+    # <s kind="id">q1</s>
+    # states -- множество уже разобранных состояний
+    # kinds -- виды лексем уже разобранных допускающих состояний
+    # описание состояний целиком:
     # <states>
     #   <s>q1</s>
     #   ...
     #   <s>qn</s>
     # </states>
-    # точный тип S неизвестен
-    # возвращает множество состояний
-    def __parse_states(self, S) -> Set[str]:
-        ret = set()
-        # s представляет кусок дерева, содержащий имя состояния:
-        # <s>state_name</s>
-        for s in S:
-            if s.tag != 's':
-                raise DescriptionParseError('Wrong tag encountered')
-            elif s not in ret:
-                ret.add(s.text)
-            else:
-                raise DescriptionParseError('Encountered duplicate state: '
-                                            f'{s.text}')
-
-        return ret
+    # точный тип s неизвестен
+    def __parse_state(self, states: Set[str], kinds: Dict[str, str], s) -> None:
+        if s.tag != 's':
+            raise DescriptionParseError('Wrong tag encountered')
+        elif s not in states:
+            states.add(s.text)
+            if 'kind' in s.attrib:
+                kinds[s.text] = s.attrib['kind']
+        else:
+            raise DescriptionParseError('Encountered duplicate state: '
+                                        f'{s.text}')
 
-    # разобрать лексемы и группы, в которые лексемы входят
-    # T -- кусок дерева xml, содержащий группы лексем и 
-    # входящие в них лексемы:
+    # разобрать группу лексем и входящие в нее лексемы
+    # group -- кусок дерева xml, содержащий группу лексем:
+    # <tg name="tokengroup1">
+    #   <t>t1</t>
+    #   ...
+    #   <t>tn</t>
+    #   <r from="a" to="z"/>
+    # </tg>
+    # описание групп целиком:
     # <tokens>
-    #   <tg name="tokengroup1">
-    #     <t>t1</t>
-    #     ...
-    #     <t>tn</t>
-    #   </tg>
+    #   <tg name="tokengroup1">...</tg>
     #   ...
     # </tokens>
+    # r -- диапазон односимвольных лексем с кодами от from до to включительно
     # группа лексем может быть пустой, т.е. не содержать
     # записей о лексемах
     # подразумевается, что такая группа содержит только одну
     # лексему, совпадающую с именем группы
     # группы лексем не должны пересекаться
-    # точный тип T неизвестен
-    # возвращает отображение лексем в группы лексем
-    def __parse_tokens(self, T) -> Dict[str, str]:
-        # отображение
-        token_map = dict()
-        # конец потока лексем отображается в одноименную группу
-        token_map[Automaton.HALT] = Automaton.HALT
-        for group in T:
-            if group.tag != 'tg':
+    # token_map -- отображение уже разобранных лексем в группы
+    # ranges -- список уже разобранных диапазонов
+    # точный тип group неизвестен
+    def __parse_token_group(self, token_map: Dict[str, str],
+                            ranges: List[Tuple[str, str, str]], group) -> None:
+        if group.tag != 'tg':
+            raise DescriptionParseError('Wrong tag encountered, '
+                                        'expected tg')
+        groupname = group.attrib['name']
+        for t in group:
+            if t.tag == 'r':
+                lo, hi = t.attrib['from'], t.attrib['to']
+                if len(lo) != 1 or len(hi) != 1 or lo > hi:
+                    raise DescriptionParseError('Invalid token range: '
+                                                f'{lo}-{hi}')
+                ranges.append((lo, hi, groupname))
+                continue
+            if t.tag != 't':
                 raise DescriptionParseError('Wrong tag encountered, '
-                                            'expected tg')
-            groupname = group.attrib['name']
-            for t in group:
-                if t.tag != 't':
-                    raise DescriptionParseError('Wrong tag encountered, '
-                                                'expected t')
-                if t.text not in token_map:
-                    token_map[t.text] = groupname
-                else:
-                    raise DescriptionParseError('Token duplicate encountered: '
-                                                f'{t.text}')
-            # если группа пуста, попробовать добавить в нее лексему с тем же содержимым
-            if not group:
-                if groupname not in token_map:
-                    token_map[groupname] = groupname
-                else:
-                    raise DescriptionParseError(f'Group {groupname} cannot '
-                                                'be empty: '
-                                                f'token {groupname} exists')
-        return token_map
-
-    # разобрать переходы
-    # Tr -- кусок дерева, содержащий переходы:
+                                            'expected t or r')
+            if t.text not in token_map:
+                token_map[t.text] = groupname
+            else:
+                raise DescriptionParseError('Token duplicate encountered: '
+                                            f'{t.text}')
+        # если группа пуста, попробовать добавить в нее лексему с тем же содержимым
+        if not len(group):
+            if groupname not in token_map:
+                token_map[groupname] = groupname
+            else:
+                raise DescriptionParseError(f'Group {groupname} cannot '
+                                            'be empty: '
+                                            f'token {groupname} exists')
+
+    # завершить разбор лексем после разбора всех групп
+    # диапазоны не должны пересекаться друг с другом
+    # и содержать лексемы, перечисленные по отдельности
+    # диапазоны сохраняются в token_ranges, упорядоченными по началу
+    def __finish_tokens(self, token_map: Dict[str, str],
+                        ranges: List[Tuple[str, str, str]]) -> None:
+        ranges.sort()
+        for (lo1, hi1, _), (lo2, hi2, _) in zip(ranges, ranges[1:]):
+            if lo2 <= hi1:
+                raise DescriptionParseError('Token ranges intersect: '
+                                            f'{lo1}-{hi1}, {lo2}-{hi2}')
+        self.token_ranges: List[Tuple[str, str, str]] = ranges
+        self.range_starts: List[str] = [lo for lo, _, _ in ranges]
+        for t in token_map:
+            if self.__range_group(t) is not None:
+                raise DescriptionParseError('Token duplicate encountered: '
+                                            f'{t}')
+        self.token_map: Dict[str, str] = token_map
+
+    # группа диапазона, в который входит лексема token
+    # (None, если такого диапазона нет)
+    def __range_group(self, token: str) -> Optional[str]:
+        if len(token) != 1:
+            return None
+        i = bisect_right(self.range_starts, token) - 1
+        if i >= 0 and token <= self.token_ranges[i][1]:
+            return self.token_ranges[i][2]
+        return None
+
+    # группа лексем, в которую входит лексема token
+    # (None, если лексема не из алфавита)
+    def group_of(self, token: str) -> Optional[str]:
+        tg = self.token_map.get(token)
+        if tg is None and self.token_ranges and isinstance(token, str):
+            tg = self.__range_group(token)
+        return tg
+
+    # разобрать переход
+    # t -- кусок дерева, содержащий переход:
+    # <tr start="qx" token="t" end="qy" action="a1"/>
+    # описание переходов целиком:
     # <transitions>
     #   <tr start="qx" token="t" end="qy" action="a1"/>
     #   ...
@@ -130,84 +196,405 @@ class Automaton:
     # никакое действие не выполняется)
     # переход по концу последовательности обозначается пустой строкой в tg
     # end в таком случае может быть любым
-    # точный тип Tr неизвестен
-    # возвращает отображение пар (состояние, группа_лексем) в пары
-    # (состояние, действие) TransitionTable
-    def __parse_transitions(self, Tr) -> TransitionTable:
-        token_groups = set(self.token_map[tg] for tg in self.token_map)
-        ret = dict()
-        for t in Tr:
-            if t.tag != 'tr':
-                raise DescriptionParseError('Wrong tag encountered')
-            else:
-                s = t.attrib['start']
-                if s not in self.states:
-                    raise DescriptionParseError('State not in state set:'
-                                                f' {s}')
-                tg = t.attrib['token']
-                if tg not in token_groups:
-                    raise DescriptionParseError('Token group not in token map:'
-                                                f' {tg}'
-                                                f'Token groups found: {token_groups}')
-                # уже есть переход из s по tg -- ошибка
-                if (s, tg) in ret:
-                    raise DescriptionParseError('Transition ambiguity '
-                                                f'encountered at {(s, tg)}')
-                else:
-                    # получить из attrib имя действия (по ключу action)
-                    # если ключа action в attrib нет, то вернуть пустую строку
-                    # (отсутствие действия)
-                    action_name = t.attrib.get('action', '')
-                    end = t.attrib['end']
-                    # end нет во множестве состояний и tg не конец последовательности -- ошибка
-                    if end not in self.states and tg != self.HALT and end != self.HALT:
-                        raise DescriptionParseError('State not in state set: '
-                                                    f'{end} (and is not HALT)')
-                    ret[s, tg] = end, action_name
+    # ret -- отображение пар (состояние, группа_лексем) в пары
+    # (состояние, действие) TransitionTable, дополняемое переходом
+    # token_groups -- множество групп лексем
+    # точный тип t неизвестен
+    def __parse_transition(self, ret: TransitionTable, token_groups: Set[str], t) -> None:
+        s, tg = self.__transition_source(token_groups, t)
+        # уже есть переход из s по tg -- ошибка
+        if (s, tg) in ret:
+            raise DescriptionParseError('Transition ambiguity '
+                                        f'encountered at {(s, tg)}')
+        ret[s, tg] = self.__transition_target(tg, t)
 
+    # разобрать переход недетерминированного автомата (type="nfa")
+    # в отличие от детерминированного, из состояния может быть
+    # несколько переходов по одной группе лексем,
+    # а переход без атрибута token является пустым (эпсилон-переходом):
+    # <tr start="qx" end="qy"/>
+    # пустой переход ведет в состояние из множества состояний
+    # и не может иметь действия
+    # moves -- список переходов (состояние, группа_лексем или None
+    # для пустого перехода, состояние, действие), дополняемый переходом
+    def __parse_nfa_transition(self, moves: List[Tuple[str, Optional[str], str, str]],
+                               token_groups: Set[str], t) -> None:
+        s, tg = self.__transition_source(token_groups, t, epsilon=True)
+        end, action_name = self.__transition_target(tg, t)
+        if tg is None:
+            if end not in self.states:
+                raise DescriptionParseError('State not in state set: '
+                                            f'{end}')
+            if action_name:
+                raise DescriptionParseError('Epsilon transition cannot have '
+                                            f'an action: {(s, end)}')
+        moves.append((s, tg, end, action_name))
+
+    # начальное состояние и группа лексем перехода t
+    # epsilon -- допустим ли переход без группы лексем
+    # (группа равна None)
+    def __transition_source(self, token_groups: Set[str], t,
+                            epsilon: bool = False) -> Tuple[str, Optional[str]]:
+        if t.tag != 'tr':
+            raise DescriptionParseError('Wrong tag encountered')
+        s = t.attrib['start']
+        if s not in self.states:
+            raise DescriptionParseError('State not in state set:'
+                                        f' {s}')
+        if epsilon and 'token' not in t.attrib:
+            return s, None
+        tg = t.attrib['token']
+        if tg not in token_groups:
+            raise DescriptionParseError('Token group not in token map:'
+                                        f' {tg}'
+                                        f'Token groups found: {token_groups}')
+        return s, tg
+
+    # конечное состояние и действие перехода t по группе tg
+    def __transition_target(self, tg: Optional[str], t) -> Tuple[str, str]:
+        # получить из attrib имя действия (по ключу action)
+        # если ключа action в attrib нет, то вернуть пустую строку
+        # (отсутствие действия)
+        action_name = t.attrib.get('action', '')
+        end = t.attrib['end']
+        # end нет во множестве состояний и tg не конец последовательности -- ошибка
+        if end not in self.states and tg != self.HALT and end != self.HALT:
+            raise DescriptionParseError('State not in state set: '
+                                        f'{end} (and is not HALT)')
+        return end, action_name
+
+    # разобрать описание автомата из xml файла filename
+    # файл читается потоково (iterparse): элементы состояний, групп
+    # лексем и переходов разбираются по мере чтения и сразу удаляются
+    # из дерева, так что все описание в памяти не хранится
+    # разделы states, tokens и transitions могут идти в любом порядке;
+    # переходы, прочитанные раньше состояний или лексем,
+    # разбираются после чтения всего файла
+    # атрибут корня type="nfa" разрешает недетерминированные
+    # и пустые переходы (см. __parse_nfa_transition); такой автомат
+    # преобразуется в детерминированный построением подмножеств (см. nfa)
+    def __load(self, filename: str) -> None:
+        states: Set[str] = set()
+        # виды лексем допускающих состояний в порядке описания
+        kinds: Dict[str, str] = dict()
+        token_map: Dict[str, str] = dict()
+        # конец потока лексем отображается в одноименную группу
+        token_map[Automaton.HALT] = Automaton.HALT
+        ranges: List[Tuple[str, str, str]] = []
+        transitions: Automaton.TransitionTable = dict()
+        # переходы недетерминированного автомата
+        moves: List[Tuple[str, Optional[str], str, str]] = []
+        nondeterministic = False
+        token_groups: Optional[Set[str]] = None
+        # отложенные переходы
+        pending: List[Any] = []
+        # разобранные разделы; как и прежде, учитывается только
+        # первый раздел каждого вида
+        done: Set[str] = set()
+        root = None
+        section = None
+        depth = 0
+        for event, el in xml.iterparse(filename, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 1:
+                    root = el
+                    kind = root.attrib.get('type', 'dfa')
+                    if kind not in ('dfa', 'nfa'):
+                        raise DescriptionParseError(f'Unknown automaton type: {kind}')
+                    nondeterministic = kind == 'nfa'
+                elif depth == 2:
+                    section = el if el.tag not in done else None
+                continue
+            depth -= 1
+            if depth == 2 and section is not None:
+                # элемент раздела прочитан целиком
+                if section.tag == 'states':
+                    self.__parse_state(states, kinds, el)
+                elif section.tag == 'tokens':
+                    self.__parse_token_group(token_map, ranges, el)
+                elif section.tag == 'transitions':
+                    if token_groups is None:
+                        if el.tag != 'tr':
+                            raise DescriptionParseError('Wrong tag encountered')
+                        pending.append(xml.Element(el.tag, dict(el.attrib)))
+                    elif nondeterministic:
+                        self.__parse_nfa_transition(moves, token_groups, el)
+                    else:
+                        self.__parse_transition(transitions, token_groups, el)
+                section.remove(el)
+            elif depth == 1:
+                if section is not None:
+                    done.add(section.tag)
+                    if section.tag == 'states':
+                        self.states: Set[str] = states
+                        self.kinds: Dict[str, str] = kinds
+                    elif section.tag == 'tokens':
+                        self.__finish_tokens(token_map, ranges)
+                    if {'states', 'tokens'} <= done and token_groups is None:
+                        token_groups = self.__token_groups()
+                        self.__check_start_state(root)
+                section = None
+                root.remove(el)
+
+        for section in ('states', 'tokens', 'transitions'):
+            if section not in done:
+                raise DescriptionParseError(f'Section missing: {section}')
+        for t in pending:
+            if nondeterministic:
+                self.__parse_nfa_transition(moves, token_groups, t)
+            else:
+                self.__parse_transition(transitions, token_groups, t)
+        if nondeterministic:
+            # отсутствует переход по концу последовательности -- ошибка
+            if all(tg != self.HALT for _, tg, _, _ in moves):
+                raise DescriptionParseError('HALT transition missing')
+            self.states, self.start_state, transitions, self.kinds = determinize(
+                self.states, self.start_state, moves, self.kinds)
         # отсутствует переход по концу последовательности -- ошибка
-        if all((s, self.HALT) not in ret for s in self.states):
+        elif all((s, self.HALT) not in transitions for s in self.states):
             raise DescriptionParseError('HALT transition missing')
-        return ret
+        self.transitions: Automaton.TransitionTable = transitions
 
-    # инициализатор объекта
-    # filename -- имя файла с описанием автомата (xml)
-    # actions -- диспетчер действий
-    def __init__(self, filename: str, actions: AutomatonActionDispatcher=NilFunction()):
-        tree = xml.parse(filename)
-        root = tree.getroot()
+    # множество групп лексем (после разбора лексем)
+    def __token_groups(self) -> Set[str]:
+        token_groups = set(self.token_map[tg] for tg in self.token_map)
+        token_groups |= set(tg for _, _, tg in self.token_ranges)
+        return token_groups
 
-        self.actions: AutomatonActionDispatcher = actions
-        self.states: Set[str] = self.__parse_states(root.find('states'))
+    # начальное состояние из атрибута корня описания
+    # должно быть во множестве состояний
+    def __check_start_state(self, root) -> None:
         self.start_state = root.attrib['start_state']
         if self.start_state not in self.states:
             raise DescriptionParseError('State not in state set: '
                                         f'{self.start_state}')
 
-        self.token_map: Dict[str, str] = self.__parse_tokens(root.find('tokens'))
-        self.transitions: Automaton.TransitionTable = self.__parse_transitions(root.find('transitions'))
+    # инициализатор объекта
+    # filename -- имя файла с описанием автомата (xml)
+    # actions -- диспетчер действий
+    # mode -- режим разбора (см. MODES)
+    def __init__(self, filename: str, actions: AutomatonActionDispatcher=NilFunction(),
+                 mode: str = 'table'):
+        if mode not in Automaton.MODES:
+            raise ValueError(f'Unknown automaton mode: {mode}')
+        self.mode = mode
+        self.filename = filename
+        self.actions: AutomatonActionDispatcher = actions
+        self.__load(filename)
+        self.compile()
+
+    # построить таблицу переходов по разобранному описанию
+    # выполняется заново после любого изменения описания
+    def compile(self) -> None:
+        self.table = CompiledTable(self)
+        # распознаватель на re строится при первом разборе без действий
+        self.__recognizer: Any = None
+        self.__recognizer_built = False
+        if self.mode == 'numpy':
+            self.classifier = Classifier(self.table)
+        elif self.mode == 'generated':
+            self.generated = codegen.load(self, self.filename)
+            # функции разбора (run, halt), связанные с диспетчером
+            self.program = self.generated.make(self._table_actions())
+
+    # минимизировать автомат с учетом действий (см. minimize)
+    # и перестроить таблицу переходов
+    # эквивалентные состояния заменяются одним из них, поэтому
+    # диспетчер может получать другие имена состояний
+    # возвращает количество удаленных состояний и переходов
+    def minimize(self) -> Tuple[int, int]:
+        removed = minimize(self)
+        self.compile()
+        return removed
 
     # разобрать поток лексем/символов с помощью автомата
     # token_stream -- поток лексем/символов
+    # либо побайтовый источник (bytes, mmap, memoryview) в UTF-8
     def parse(self, token_stream: Iterable[str]) -> bool:
+        if self.mode == 'reference':
+            return self.parse_reference(token_stream)
+        # автомат без действий только распознает вход:
+        # строка проверяется регулярным выражением
+        if self._table_actions() is None and (isinstance(token_stream, str)
+                                              or is_buffer(token_stream)):
+            recognize = self.recognizer()
+            if recognize is not None:
+                return recognize(token_stream)
+        P = self.parser()
+        if is_buffer(token_stream):
+            self.actions.bind(token_stream)
+        return P.feed(token_stream) and P.finish()
+
+    # разобрать пакет строк автоматом без действий
+    # строки продвигаются по автомату одновременно векторными
+    # операциями numpy (см. Classifier.run_batch)
+    # возвращает пару массивов numpy: допущена ли строка
+    # и смещение символа, на котором разбор строки завершился неудачей
+    # (-1 для допущенных строк)
+    def parse_batch(self, strings: Iterable[Any]) -> Tuple[Any, Any]:
+        if self._table_actions() is not None:
+            raise ValueError('Batch parsing requires an automaton without actions')
+        classifier = self.classifier if self.mode == 'numpy' else Classifier(self.table)
+        return classifier.run_batch(strings)
+
+    # разбить строку или побайтовый источник в UTF-8 на лексемы
+    # по наибольшему совпадению (см. scan)
+    # лексемы определяются допускающими состояниями с атрибутом kind,
+    # диспетчер действий не вызывается
+    # возвращает итератор записей (вид, начало, конец);
+    # если в какой-либо позиции лексема не допускается, возбуждается ScanError
+    def scan(self, source: Any) -> Iterator[Tuple[str, int, int]]:
+        return scan(self.table, source)
+
+    # разобрать строку или файл (os.PathLike, текст в UTF-8), вычисляя
+    # переходы частей входа в нескольких процессах
+    # (см. parallel.parse_parallel); побайтовый источник в памяти
+    # разбирается последовательно с предупреждением RuntimeWarning
+    # быстрее parse только для автоматов без действий: действия
+    # выполняются последовательным проходом по допущенной части входа
+    def parse_parallel(self, source: Any, workers: Optional[int] = None,
+                       chunk_size: int = parallel.CHUNK_SIZE) -> bool:
+        return parallel.parse_parallel(self, source, workers, chunk_size)
+
+    # разобрать source несколькими автоматами automata за один проход
+    # (см. multi.MultiParser)
+    # возвращает для каждого автомата, допущен ли им вход
+    @staticmethod
+    def parse_many(automata: Iterable['Automaton'], source: Any) -> List[bool]:
+        return multi.parse_many(list(automata), source)
+
+    # функция распознавания входа регулярным выражением (см. regex)
+    # None, если выражение для автомата получается слишком длинным
+    # и разбор выполняется по таблице
+    def recognizer(self) -> Optional[Any]:
+        if not self.__recognizer_built:
+            self.__recognizer = recognizer(self.table)
+            self.__recognizer_built = True
+        return self.__recognizer
+
+    # начать возобновляемый разбор (см. Automaton.Parser)
+    def parser(self) -> 'Automaton.Parser':
+        return Automaton.Parser(self)
+
+    # возобновляемый разбор потока, подаваемого частями
+    # между вызовами feed сохраняется текущее состояние автомата,
+    # контекст разбора хранится в диспетчере действий
+    class Parser:
+        def __init__(self, automaton: 'Automaton'):
+            self.automaton = automaton
+            # сбросить состояние диспетчера
+            automaton.actions.reset()
+            # текущее состояние автомата
+            # None -- разбор завершен (неудачно либо вызовом finish)
+            self.state: Any = automaton._start()
+            # незавершенный многобайтный символ в конце предыдущей
+            # побайтовой части
+            self.pending = b''
+
+        # продолжить разбор очередной частью потока
+        # часть может быть побайтовой (bytes, mmap, memoryview),
+        # символ UTF-8 может быть разбит между частями
+        # возвращает false, если разбор завершился неудачей
+        def feed(self, chunk: Iterable[str]) -> bool:
+            if self.state is None:
+                return False
+            if is_buffer(chunk):
+                if self.pending:
+                    chunk = self.pending + bytes(chunk)
+                k = incomplete_tail(chunk)
+                self.pending = bytes(chunk[len(chunk)-k:]) if k else b''
+                if k:
+                    chunk = memoryview(chunk)[:len(chunk)-k]
+            self.state = self.automaton._run(self.state, chunk)
+            return self.state is not None
+
+        # завершить разбор переходом по концу последовательности
+        def finish(self) -> bool:
+            s = self.state
+            self.state = None
+            # поток оборвался посреди символа
+            if self.pending:
+                return False
+            return s is not None and self.automaton._halt(s)
+
+    # начальное состояние в представлении текущего режима
+    def _start(self) -> Any:
+        if self.mode == 'reference':
+            return self.start_state
+        if self.mode == 'generated':
+            return self.generated.START
+        return self.table.start
+
+    # выполнить переходы из состояния s по лексемам из token_stream
+    # возвращает новое состояние или None при неудаче
+    def _run(self, s: Any, token_stream: Iterable[str]) -> Any:
+        buffer = is_buffer(token_stream)
+        if self.mode == 'reference':
+            if buffer:
+                token_stream = iter_chars(token_stream)
+            for token in token_stream:
+                s = self.__step_reference(s, token)
+                if s is None:
+                    return None
+            return s
+        if self.mode == 'generated':
+            if buffer:
+                token_stream = iter_chars(token_stream)
+            return self.program[0](s, token_stream)
+        actions = self._table_actions()
+        if self.mode == 'numpy' and (buffer or isinstance(token_stream, str)):
+            return self.classifier.run(s, token_stream, actions)
+        if buffer:
+            return self.table.run_bytes(s, token_stream, actions)
+        return self.table.run(s, token_stream, actions)
+
+    # выполнить переход из состояния s по концу последовательности
+    def _halt(self, s: Any) -> bool:
+        if self.mode == 'reference':
+            return self.__step_reference(s, Automaton.HALT) is not None
+        if self.mode == 'generated':
+            return self.program[1](s)
+        return self.table.halt_step(s, self._table_actions())
+
+    # диспетчер для разбора по таблице
+    # ничего не делающий диспетчер не вызывается вовсе
+    def _table_actions(self) -> Optional[AutomatonActionDispatcher]:
+        if isinstance(self.actions, Automaton.NilFunction):
+            return None
+        return self.actions
+
+    # выполнить один переход по словарям описания
+    # возвращает новое состояние или None при неудаче
+    def __step_reference(self, s: str, token: str) -> Optional[str]:
+        tg = self.group_of(token)
+        # встречена лексема не из алфавита
+        if tg is None:
+            return None
+        # нет перехода
+        if (s, tg) not in self.transitions:
+            return None
+        new_s, A = self.transitions[s, tg]
+        # действие существует и его результат - false
+        if A and not self.actions(s, token, A):
+            return None
+        # перейти к новому состоянию
+        return new_s
+
+    # разобрать поток лексем/символов по словарям описания
+    # результаты совпадают с parse
+    def parse_reference(self, token_stream: Iterable[str]) -> bool:
         # текущее состояние автомата
         s = self.start_state
         # сбросить состояние диспетчера
         self.actions.reset()
+        if is_buffer(token_stream):
+            self.actions.bind(token_stream)
+            token_stream = iter_chars(token_stream)
         # обернуть поток в HaltIterable
         TS = Automaton.HaltIterable(token_stream)
         for token in TS:
-            # встречена лексема не из алфавита            
-            if token not in self.token_map:
-                return False
-            tg = self.token_map[token]
-            # нет перехода
-            if (s, tg) not in self.transitions:
-                return False
-            new_s, A = self.transitions[s, tg]
-            # действие существует и его результат - false
-            if A and not self.actions(s, token, A):
+            s = self.__step_reference(s, token)
+            if s is None:
                 return False
-            # перейти к новому состоянию
-            s = new_s
         return True
@@ -0,0 +1,218 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .dispatcher import AutomatonActionDispatcher, AutomatonRunDispatcher
+from .source import ASCII, byte_view, is_buffer
+from .table import CompiledTable
+
+# numpy -- необязательная зависимость,
+# нужна только для режима 'numpy'
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# предварительная классификация символов для посимвольных автоматов
+# классы всех символов входа вычисляются одной операцией numpy
+# по таблице "код символа -> класс", после чего цикл по состояниям
+# выполняет только переходы
+# лексемы длиннее одного символа при разборе строки
+# встретиться не могут и в таблицу не попадают
+class Classifier:
+    # наибольший код символа, классы диапазонов до которого
+    # хранятся в таблице
+    LUT_LIMIT = 0xFFFF
+
+    def __init__(self, table: CompiledTable):
+        if np is None:
+            raise ImportError('numpy is required for the numpy automaton mode')
+        self.table = table
+        codes = {ord(t): c for t, c in table.classes.items() if len(t) == 1}
+        starts = [ord(lo) for lo in table.range_starts]
+        ends = [ord(hi) for hi in table.range_ends]
+        # таблица покрывает все отдельные символы алфавита
+        # и диапазоны в пределах BMP; символы с большими кодами
+        # ищутся среди диапазонов двоичным поиском
+        top = max([max(codes, default=0)] + [min(e, Classifier.LUT_LIMIT) for e in ends])
+        # последний элемент таблицы соответствует всем символам
+        # с кодами больше покрываемых таблицей
+        size = top + 2
+        self.lut = np.full(size, CompiledTable.NONE, dtype=np.int32)
+        for lo, hi, c in zip(starts, ends, table.range_classes):
+            if lo < size - 1:
+                self.lut[lo:min(hi, size - 2) + 1] = c
+        for code, c in codes.items():
+            self.lut[code] = c
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        self.range_classes = np.array(table.range_classes, dtype=np.int32)
+
+    # коды символов входа
+    # text -- строка либо побайтовый источник в UTF-8
+    # возвращает пару (массив кодов, строка или буфер для извлечения лексем)
+    def _codes(self, text: Any):
+        if is_buffer(text):
+            raw = np.frombuffer(byte_view(text), dtype=np.uint8)
+            # только ASCII -- байт совпадает с кодом символа
+            if not (raw >= 0x80).any():
+                return raw, text
+            text = bytes(text).decode('utf-8', 'replace')
+        raw = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'),
+                            dtype='<u4')
+        return raw, text
+
+    # массив классов символов text (NONE для символов не из алфавита)
+    def classify(self, text: Any):
+        return self._classify(self._codes(text)[0])
+
+    def _classify(self, raw):
+        top = len(self.lut) - 1
+        # коды байтов ASCII целиком покрываются таблицей
+        if raw.dtype == np.uint8 and top > 0xFF:
+            return self.lut[raw]
+        classes = self.lut[np.minimum(raw, top)]
+        # символы за пределами таблицы
+        far = np.flatnonzero(raw >= top)
+        if len(far) and len(self.starts):
+            codes = raw[far].astype(np.int64)
+            i = np.searchsorted(self.starts, codes, side='right') - 1
+            inside = (i >= 0) & (codes <= self.ends[np.maximum(i, 0)])
+            classes[far[inside]] = self.range_classes[i[inside]]
+        return classes
+
+    # то же, что CompiledTable.run, но с предварительной классификацией
+    # символ не из алфавита находится заранее; переходы до него
+    # (вместе с действиями) выполняются как обычно
+    def run(self, s: int, text: Any,
+            actions: Optional[AutomatonActionDispatcher]) -> Optional[int]:
+        T = self.table
+        source = text
+        raw, text = self._codes(text)
+        classes = self._classify(raw)
+        bad = np.flatnonzero(classes < 0)
+        n = int(bad[0]) if len(bad) else len(classes)
+        steps = T.steps_for(actions)
+        if actions is None:
+            # без действий лексемы не нужны, выполняются только переходы
+            for c in classes[:n].tolist():
+                s = steps[s + c][0]
+                # нет перехода
+                if s < 0:
+                    return None
+            return s if n == len(classes) else None
+        runs = T.runs_for(actions)
+        # побайтовый источник с многобайтными символами декодирован
+        # в строку, позиции серий в нем не совпали бы с позициями байтов
+        if runs and (is_buffer(text) or isinstance(source, str)):
+            s = self.__run_coalescing(s, classes[:n].tolist(), text, actions, runs)
+            return s if n == len(classes) else None
+        # для буфера ASCII лексемы берутся из таблицы односимвольных строк
+        tokens = text if isinstance(text, str) else (ASCII[b] for b in byte_view(text))
+        names = T.action_names
+        for c, token in zip(classes[:n].tolist(), tokens):
+            new_s, A = steps[s + c]
+            # нет перехода
+            if new_s < 0:
+                return None
+            # действие существует и его результат - false
+            if A and not actions(T.state_name(s), token, names[A]):
+                return None
+            s = new_s
+        # встречен символ не из алфавита
+        if n < len(classes):
+            return None
+        return s
+
+    # переходы по классам символов с выполнением действий петель
+    # для серий символов (см. CompiledTable.run_loops)
+    # text -- строка либо буфер ASCII, позиции в котором
+    # совпадают с позициями классов
+    # возвращает новое состояние или None при неудаче
+    def __run_coalescing(self, s: int, classes: List[int], text: Any,
+                         actions: AutomatonRunDispatcher,
+                         runs: Dict[Tuple[int, int], Tuple[Callable, Optional[Callable]]]) -> Optional[int]:
+        T = self.table
+        steps = T.steps
+        names = T.action_names
+        # шаблон для строки либо для байтов
+        k = 0 if isinstance(text, str) else 1
+        if k:
+            text = byte_view(text)
+        i = 0
+        n = len(classes)
+        while i < n:
+            new_s, A = steps[s + classes[i]]
+            # нет перехода
+            if new_s < 0:
+                return None
+            if new_s == s and (s, A) in runs:
+                # выполнить действие для всей серии символов петли
+                j = runs[s, A][k](text, i + 1).end()
+                run = text[i:j] if k == 0 else bytes(text[i:j]).decode('ascii')
+                if not actions.run(T.state_name(s), i, j, run, names[A]):
+                    return None
+                i = j
+                continue
+            # действие существует и его результат - false
+            if A:
+                token = text[i] if k == 0 else ASCII[text[i]]
+                if not actions(T.state_name(s), token, names[A]):
+                    return None
+            s = new_s
+            i += 1
+        return s
+
+    # выполнить переходы без действий сразу для многих строк
+    # все строки продвигаются на один символ за шаг: классы
+    # очередных символов и переходы выбираются векторными операциями
+    # strings -- последовательность строк (побайтовые источники
+    # декодируются из UTF-8)
+    # возвращает пару массивов: допущена ли строка автоматом
+    # и смещение (в символах) символа, на котором разбор завершился
+    # неудачей (длина строки, если не удался переход по концу
+    # последовательности; -1 для допущенных строк)
+    def run_batch(self, strings: Iterable[Any]) -> Tuple[Any, Any]:
+        T = self.table
+        texts = list(strings)
+        try:
+            joined = ''.join(texts)
+        except TypeError:
+            texts = [bytes(t).decode('utf-8', 'replace') if is_buffer(t) else t
+                     for t in texts]
+            joined = ''.join(texts)
+        n = len(texts)
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        classes = self._classify(self._codes(joined)[0])
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        # строки упорядочиваются по убыванию длины, так что строки,
+        # еще не разобранные до конца, всегда занимают начало массивов
+        order = np.argsort(-lengths, kind='stable')
+        lengths = lengths[order]
+        starts = starts[order]
+        next_ = np.array(T.next, dtype=np.int64)
+        # строка, разбор которой завершился неудачей, переводится
+        # в мертвое состояние: переходов из него нет
+        dead = T.dead * T.n_classes
+        state = np.full(n, T.start, dtype=np.int64)
+        fail = np.full(n, -1, dtype=np.int64)
+        # количество строк длиннее i для каждого шага i
+        active = np.searchsorted(-lengths, -np.arange(int(lengths[0]) if n else 0),
+                                 side='left')
+        for i, k in enumerate(active.tolist()):
+            c = classes[starts[:k] + i]
+            s = state[:k]
+            new = np.where(c >= 0, next_[s + np.maximum(c, 0)], CompiledTable.NONE)
+            failed = new < 0
+            # запомнить место первой неудачи
+            fail[:k][failed & (fail[:k] < 0)] = i
+            new[failed] = dead
+            state[:k] = new
+        # переход по концу последовательности
+        halted = next_[state + T.halt] >= 0
+        accept = (fail < 0) & halted
+        fail[(fail < 0) & ~halted] = lengths[(fail < 0) & ~halted]
+        result_accept = np.empty(n, dtype=bool)
+        result_fail = np.empty(n, dtype=np.int64)
+        result_accept[order] = accept
+        result_fail[order] = fail
+        return result_accept, result_fail
@@ -0,0 +1,245 @@
+import hashlib
+import importlib.util
+import os
+import sys
+from typing import Any, Dict, List, Tuple
+from .table import CompiledTable
+
+# генерация модуля Python по описанию автомата
+# переходы скомпилированной таблицы (CompiledTable) записываются
+# ветвлениями по номерам состояний и классов внутри одной функции,
+# действия вызываются через заранее связанные методы диспетчера
+# сгенерированный модуль содержит:
+# START -- номер начального состояния
+# make(dispatcher) -- пара функций (run, halt) для диспетчера
+# (None -- разбор без действий)
+# run(s, tokens) -- выполнить переходы по лексемам, вернуть новое
+# состояние или None при неудаче
+# halt(s) -- выполнить переход по концу последовательности
+
+# суффикс имени модуля, сохраняемого рядом с описанием
+SUFFIX = '_dfa'
+
+
+# ключ описания автомата: модуль, сгенерированный
+# по описанию с тем же ключом, можно использовать повторно
+def description_key(automaton) -> str:
+    description = (sorted(automaton.states), automaton.start_state,
+                   sorted(automaton.token_map.items()), automaton.token_ranges,
+                   sorted(automaton.transitions.items()))
+    return hashlib.sha1(repr(description).encode('utf-8')).hexdigest()
+
+
+# ветви переходов из состояния с номером i
+# возвращает список пар (классы, (номер нового состояния, номер действия))
+def _branches(table: CompiledTable, i: int) -> List[Tuple[List[int], Tuple[int, int]]]:
+    n = table.n_classes
+    targets: Dict[Tuple[int, int], List[int]] = dict()
+    for c in range(n):
+        end = table.next[i * n + c]
+        if end >= 0:
+            targets.setdefault((end // n, table.action[i * n + c]), []).append(c)
+    return [(cs, target) for target, cs in targets.items()]
+
+
+# условие на номер класса
+def _condition(cs: List[int]) -> str:
+    if len(cs) == 1:
+        return f'c == {cs[0]}'
+    return f'c in {tuple(cs)!r}'
+
+
+# тело цикла разбора и функции halt
+# with_actions -- вызывать ли действия
+def _functions(table: CompiledTable, with_actions: bool, indent: str) -> List[str]:
+    names = table.state_names
+    lines = [f'def run(s, tokens):',
+             f'    get = CLASSES.get',
+             f'    for t in tokens:',
+             f'        c = get(t)',
+             f'        if c is None:',
+             f'            c = range_class(t)',
+             f'            # встречена лексема не из алфавита',
+             f'            if c is None:',
+             f'                return None']
+    keyword = 'if'
+    for i in range(table.dead):
+        # класс конца последовательности может совпадать с классом
+        # других групп, поэтому ветви для него не исключаются:
+        # сама лексема конца последовательности в CLASSES не входит
+        branches = _branches(table, i)
+        if not branches:
+            continue
+        lines.append(f'        {keyword} s == {i}:')
+        keyword = 'elif'
+        inner = 'if'
+        for cs, (end, A) in branches:
+            lines.append(f'            {inner} {_condition(cs)}:')
+            inner = 'elif'
+            if A and with_actions:
+                lines.append(f'                if not a{A}({names[i]!r}, t):')
+                lines.append(f'                    return None')
+            if end != i:
+                lines.append(f'                s = {end}')
+            elif not (A and with_actions):
+                lines.append(f'                pass')
+        lines.append(f'            else:')
+        lines.append(f'                return None')
+    # мертвое состояние и состояния без переходов
+    if keyword == 'if':
+        lines.append(f'        return None')
+    else:
+        lines.append(f'        else:')
+        lines.append(f'            return None')
+    lines.append(f'    return s')
+    lines.append(f'')
+    lines.append(f'def halt(s):')
+    keyword = 'if'
+    for i in range(table.dead):
+        end = table.next[i * table.n_classes + table.halt]
+        if end < 0:
+            continue
+        A = table.action[i * table.n_classes + table.halt]
+        lines.append(f'    {keyword} s == {i}:')
+        keyword = 'elif'
+        if A and with_actions:
+            lines.append(f'        return a{A}({names[i]!r}, {table.halt_token!r})')
+        else:
+            lines.append(f'        return True')
+    lines.append(f'    return False')
+    return [indent + line if line else line for line in lines]
+
+
+# исходный текст модуля для автомата automaton
+def generate(automaton) -> str:
+    table = CompiledTable(automaton)
+    classes = {t: c for t, c in automaton.token_map.items()
+               if t != automaton.HALT}
+    for t, tg in classes.items():
+        classes[t] = table.group_class[tg]
+    lines = ['# модуль сгенерирован packages/automata/codegen.py',
+             '# по описанию автомата; не редактировать',
+             '',
+             'from bisect import bisect_right',
+             '',
+             f'KEY = {description_key(automaton)!r}',
+             f'START = {table.start // table.n_classes}',
+             f'STATES = {table.state_names!r}',
+             f'ACTIONS = {table.action_names!r}',
+             '# лексема -> номер класса',
+             f'CLASSES = {classes!r}',
+             '# диапазоны односимвольных лексем',
+             f'RANGE_STARTS = {table.range_starts!r}',
+             f'RANGE_ENDS = {table.range_ends!r}',
+             f'RANGE_CLASSES = {table.range_classes!r}',
+             '',
+             '',
+             '# класс лексемы из диапазонов (None, если не входит)',
+             'def range_class(t):',
+             '    if not RANGE_STARTS or not isinstance(t, str) or len(t) != 1:',
+             '        return None',
+             '    i = bisect_right(RANGE_STARTS, t) - 1',
+             '    if i < 0 or t > RANGE_ENDS[i]:',
+             '        return None',
+             '    c = CLASSES[t] = RANGE_CLASSES[i]',
+             '    return c',
+             '',
+             '',
+             '# действие A диспетчера dispatcher в виде функции (state, token)',
+             '# связанный метод берется из словаря actions_map диспетчера,',
+             '# если он есть, иначе вызывается сам диспетчер',
+             'def bind(dispatcher, A):',
+             "    method = getattr(dispatcher, 'actions_map', {}).get(A)",
+             '    if method is not None:',
+             '        return method',
+             '    return lambda s, t: dispatcher(s, t, A)',
+             '',
+             '',
+             'def make(dispatcher):',
+             '    if dispatcher is None:',
+             '        return run_bare, halt_bare']
+    for A in range(1, len(table.action_names)):
+        lines.append(f'    a{A} = bind(dispatcher, {table.action_names[A]!r})')
+    lines.append('')
+    lines += _functions(table, True, '    ')
+    lines.append('')
+    lines.append('    return run, halt')
+    lines.append('')
+    lines.append('')
+    lines.append('# разбор без действий')
+    bare = _functions(table, False, '')
+    bare[0] = bare[0].replace('def run(', 'def run_bare(')
+    bare = [line.replace('def halt(', 'def halt_bare(') for line in bare]
+    lines += bare
+    return '\n'.join(lines) + '\n'
+
+
+# создать модуль из исходного текста source без файла
+# (если записать сгенерированный модуль нельзя)
+def load_module(name: str, source: str, path: str) -> Any:
+    module = type(sys)(name)
+    module.__file__ = path
+    exec(compile(source, path, 'exec'), module.__dict__)
+    return module
+
+
+# импортировать модуль name из файла path
+# байт-код кэшируется в __pycache__, так что повторная загрузка
+# не компилирует исходный текст заново
+def import_file(name: str, path: str) -> Any:
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# записать сгенерированный модуль source в файл path и импортировать его
+# запись идет через временный файл, чтобы параллельный процесс
+# не прочитал недописанный модуль; кэш байт-кода прежнего модуля
+# удаляется (он проверяет время изменения с точностью до секунды
+# и размер и мог бы подойти к файлу, перезаписанному сразу же)
+# если записать файл нельзя, модуль создается в памяти
+def save_module(name: str, source: str, path: str) -> Any:
+    try:
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            fp.write(source)
+        os.replace(tmp, path)
+    except OSError:
+        return load_module(name, source, path)
+    try:
+        os.remove(importlib.util.cache_from_source(path))
+    except OSError:
+        pass
+    return import_file(name, path)
+
+
+# модуль для автомата automaton, описание которого прочитано из filename
+# модуль кэшируется рядом с описанием (<имя описания>_dfa.py)
+# и генерируется заново, если описание изменилось
+# если записать файл нельзя, модуль создается в памяти
+def load(automaton, filename: str) -> Any:
+    key = description_key(automaton)
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    path = os.path.join(os.path.dirname(os.path.abspath(filename)), stem + SUFFIX + '.py')
+    name = f'{stem}{SUFFIX}_{key[:12]}'
+    try:
+        module = import_file(name, path)
+        if getattr(module, 'KEY', None) == key:
+            return module
+    except (OSError, SyntaxError):
+        pass
+    return save_module(name, generate(automaton), path)
+
+
+# сгенерировать модуль по описанию из командной строки:
+# python -m packages.automata.codegen описание.xml [модуль.py]
+if __name__ == '__main__':
+    from .automaton import Automaton
+    A = Automaton(sys.argv[1])
+    out = sys.argv[2] if len(sys.argv) > 2 else None
+    if out is None:
+        load(A, sys.argv[1])
+    else:
+        with open(out, 'w', encoding='utf-8') as fp:
+            fp.write(generate(A))
@@ -1,5 +1,5 @@
 from abc import ABCMeta, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, FrozenSet
 
 # Диспетчер действий выполняет семантический разбор потока лексем,
 # выполняя внедренные действия, и хранит в себе контекст разбора,
@@ -20,5 +20,33 @@ class AutomatonActionDispatcher(metaclass=ABCMeta):
     def reset(self) -> None:
         pass
 
+    # Сообщить диспетчеру побайтовый источник (bytes, mmap, memoryview),
+    # который будет разобран целиком. Вызывается после reset.
+    # Диспетчер может брать текст лексем срезами источника
+    # вместо накопления отдельных символов.
+    # По умолчанию источник не используется.
+    def bind(self, source: Any) -> None:
+        pass
+
     # Получение результатов разбора не регламентируется интерфейсом
-    # диспетчера действий и должно реализовываться в подклассах.
\ No newline at end of file
+    # диспетчера действий и должно реализовываться в подклассах.
+
+
+# Диспетчер действий, умеющий выполнять действие сразу для серии символов.
+# Если несколько переходов подряд являются петлями одного состояния
+# с одним и тем же действием из run_actions, автомат (в режимах
+# разбора по таблице) вызывает run один раз для всей серии вместо вызова
+# __call__ для каждого символа. Результаты разбора не должны зависеть
+# от того, какой из способов вызова был использован.
+class AutomatonRunDispatcher(AutomatonActionDispatcher):
+    # действия, для которых реализовано выполнение для серии символов
+    run_actions: FrozenSet[str] = frozenset()
+
+    # Выполнить действие action для серии символов text в состоянии state.
+    # Серия занимает позиции с start до end (не включая) в разбираемой
+    # части потока: в символах для строк, в байтах для побайтовых
+    # источников.
+    # Возвращаемое значение сигнализирует о возможности продолжения разбора.
+    @abstractmethod
+    def run(self, state: str, start: int, end: int, text: str, action: str) -> bool:
+        pass
@@ -0,0 +1,112 @@
+import codecs
+import re
+from array import array
+from bisect import bisect_right
+from typing import Any, Optional, Tuple
+from .source import byte_view, is_buffer
+
+# numpy -- необязательная зависимость: если она есть,
+# переводы строк ищутся и смещения сдвигаются целыми массивами
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# индекс переводов строк источника
+# лексеры запоминают только смещения лексем; строка и столбец
+# вычисляются по смещению двоичным поиском среди начал строк
+# и только тогда, когда позиция действительно нужна (при ошибке)
+# смещения считаются в тех же единицах, что и в лексерах:
+# в байтах для побайтового источника, переданного целиком,
+# и в символах для строк и для частей, поданных через feed
+# столбец всегда считается в символах
+
+FilePos = Tuple[int, int]
+
+NEWLINE = re.compile('\n')
+BYTE_NEWLINE = re.compile(b'\n')
+
+
+# смещения символов, следующих за переводами строк в data
+# (строке либо побайтовом источнике), увеличенные на base
+def _line_starts(data: Any, base: int) -> array:
+    starts = array('q')
+    buffer = is_buffer(data)
+    if np is not None and (buffer or data.isascii()):
+        raw = byte_view(data) if buffer else data.encode('ascii')
+        found = np.flatnonzero(np.frombuffer(raw, dtype=np.uint8) == 10)
+        starts.frombytes((found + (base + 1)).astype(np.int64).tobytes())
+        return starts
+    pattern = BYTE_NEWLINE if buffer else NEWLINE
+    starts.extend(m.end() + base for m in pattern.finditer(data))
+    return starts
+
+
+# прибавить delta к элементам массива column начиная с номера j
+def shift(column: array, j: int, delta: int) -> None:
+    if np is None:
+        column[j:] = array(column.typecode, map(delta.__add__, column[j:]))
+        return
+    # представление numpy над памятью массива (без копирования)
+    view = np.frombuffer(column, dtype=column.typecode)[j:]
+    # беззнаковые столбцы уменьшаются вычитанием
+    if delta < 0:
+        view -= -delta
+    else:
+        view += delta
+
+
+class LineIndex:
+    # source -- весь источник (строка или побайтовый источник);
+    # без него индекс строится по частям (см. feed)
+    def __init__(self, source: Any = None):
+        # смещения начал строк (первая строка начинается с 0)
+        self.starts = array('q', [0])
+        # число просмотренных позиций
+        self.size = 0
+        # побайтовый источник: столбец вычисляется декодированием
+        # начала строки (None -- смещения в символах)
+        self.source: Any = None
+        # декодер частей-байтов, поданных через feed
+        self.decoder: Optional[codecs.IncrementalDecoder] = None
+        if source is None:
+            return
+        if is_buffer(source):
+            self.source = source
+        self.starts.extend(_line_starts(source, 0))
+        self.size = len(source)
+
+    # добавить в индекс следующую часть источника
+    # (строку или байты в UTF-8; смещения считаются в символах)
+    def feed(self, chunk: Any) -> None:
+        if is_buffer(chunk):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            chunk = self.decoder.decode(byte_view(chunk))
+        self.starts.extend(_line_starts(chunk, self.size))
+        self.size += len(chunk)
+
+    # число строк
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    # позиция (строка, столбец) символа со смещением offset
+    def pos(self, offset: int) -> FilePos:
+        line = bisect_right(self.starts, offset)
+        start = self.starts[line - 1]
+        if self.source is None:
+            return line, offset - start + 1
+        text = bytes(self.source[start:offset]).decode('utf-8', 'replace')
+        return line, len(text) + 1
+
+    # заменить deleted позиций с позиции offset на текст inserted
+    # (для строкового источника, см. lab1.incremental)
+    def edit(self, offset: int, deleted: int, inserted: str) -> None:
+        starts = self.starts
+        lo = bisect_right(starts, offset)
+        hi = bisect_right(starts, offset + deleted, lo)
+        delta = len(inserted) - deleted
+        if delta:
+            shift(starts, hi, delta)
+        starts[lo:hi] = _line_starts(inserted, offset)
+        self.size += delta
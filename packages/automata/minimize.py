@@ -0,0 +1,105 @@
+from typing import Dict, List, Set, Tuple
+
+
+# минимизация детерминированного автомата алгоритмом Хопкрофта
+# с учетом внедренных действий
+# состояния эквивалентны, если для каждой группы лексем
+# у них одинаково отсутствуют переходы либо переходы выполняют одно
+# и то же действие и ведут в эквивалентные состояния
+# переходы в состояния не из множества состояний (например, в пустую
+# строку) считаются переходами в одно и то же мертвое состояние
+# состояния с разными видами допускаемых лексем (Automaton.kinds)
+# не эквивалентны
+# недостижимые состояния удаляются
+# automaton -- автомат (Automaton); его описание изменяется на месте
+# возвращает количество удаленных состояний и переходов
+def minimize(automaton) -> Tuple[int, int]:
+    T = automaton.transitions
+    n_states = len(automaton.states)
+    n_transitions = len(T)
+
+    # исходящие переходы по состояниям
+    out: Dict[str, Dict[str, Tuple[str, str]]] = {s: dict() for s in automaton.states}
+    for (s, tg), end in T.items():
+        out[s][tg] = end
+
+    # достижимые состояния
+    reachable = {automaton.start_state}
+    stack = [automaton.start_state]
+    while stack:
+        s = stack.pop()
+        for end, _ in out[s].values():
+            if end in out and end not in reachable:
+                reachable.add(end)
+                stack.append(end)
+
+    # группы лексем, по которым есть переходы
+    groups = sorted(set(tg for s in reachable for tg in out[s]))
+
+    # начальное разбиение: по виду допускаемой лексемы,
+    # наличию переходов, их действиям и переходам в мертвое состояние
+    kinds = automaton.kinds
+
+    def signature(s: str):
+        return (kinds.get(s),) + tuple((tg, out[s][tg][1], out[s][tg][0] in reachable)
+                                       for tg in groups if tg in out[s])
+
+    initial: Dict[tuple, Set[str]] = dict()
+    for s in sorted(reachable):
+        initial.setdefault(signature(s), set()).add(s)
+    blocks: List[Set[str]] = list(initial.values())
+    block_of: Dict[str, int] = {s: i for i, b in enumerate(blocks) for s in b}
+
+    # обратные переходы: (группа, состояние) -> состояния, из которых
+    # по группе есть переход в данное состояние
+    inverse: Dict[Tuple[str, str], Set[str]] = dict()
+    for s in reachable:
+        for tg, (end, _) in out[s].items():
+            if end in reachable:
+                inverse.setdefault((tg, end), set()).add(s)
+
+    # очередь разделителей (блок, группа лексем)
+    work: Set[Tuple[int, str]] = set((i, tg) for i in range(len(blocks)) for tg in groups)
+    while work:
+        B, tg = work.pop()
+        # состояния, переходящие по tg в блок B
+        X: Set[str] = set()
+        for t in blocks[B]:
+            X |= inverse.get((tg, t), set())
+        # разделить блоки, частично пересекающиеся с X
+        touched: Dict[int, Set[str]] = dict()
+        for s in X:
+            touched.setdefault(block_of[s], set()).add(s)
+        for Y, inside in touched.items():
+            if len(inside) == len(blocks[Y]):
+                continue
+            blocks[Y] -= inside
+            Z = len(blocks)
+            blocks.append(inside)
+            for s in inside:
+                block_of[s] = Z
+            for g in groups:
+                if (Y, g) in work:
+                    work.add((Z, g))
+                # достаточно обработать меньшую из частей
+                elif len(inside) <= len(blocks[Y]):
+                    work.add((Z, g))
+                else:
+                    work.add((Y, g))
+
+    # представитель блока -- начальное состояние
+    # либо первое по имени состояние блока
+    rep: Dict[int, str] = {i: min(b) for i, b in enumerate(blocks)}
+    rep[block_of[automaton.start_state]] = automaton.start_state
+
+    transitions = dict()
+    for i, b in enumerate(blocks):
+        s = rep[i]
+        for tg, (end, A) in out[s].items():
+            if end in reachable:
+                end = rep[block_of[end]]
+            transitions[s, tg] = end, A
+    automaton.states = set(rep.values())
+    automaton.transitions = transitions
+    automaton.kinds = {s: k for s, k in kinds.items() if s in automaton.states}
+    return n_states - len(automaton.states), n_transitions - len(transitions)
@@ -0,0 +1,350 @@
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from .source import ASCII, byte_view, decode_char, incomplete_tail, is_buffer, utf8_length
+from .table import CompiledTable
+
+# разбор одного входа несколькими автоматами за один проход
+# символы классифицируются один раз общей классификацией:
+# общий класс символа -- набор номеров его классов в таблицах
+# всех автоматов (NONE, если символ не из алфавита автомата)
+# автоматы продвигаются вместе как один автомат-произведение:
+# его состояние -- набор состояний автоматов (None для автомата,
+# разбор которым завершился неудачей), переходы произведения строятся
+# при первом использовании, так что на символ приходится один переход
+# независимо от числа автоматов
+# каждый автомат выполняет действия своего диспетчера и независимо
+# от остальных допускает или отвергает вход
+# разбор выполняется по скомпилированным таблицам (CompiledTable)
+# независимо от режимов автоматов
+
+# действия перехода произведения: (номер автомата, действие в виде
+# функции (state, token), имя состояния, имя действия)
+Acts = Tuple[Tuple[int, Callable[[str, str], bool], str, str], ...]
+# шаблоны серии символов петли: (match для строк либо None,
+# match для байтов либо None)
+Loop = Tuple[Optional[Callable], Optional[Callable]]
+# переход произведения: номер нового состояния, действия
+# и шаблоны серии символов, если переход -- петля, которую можно
+# выполнить для всей серии сразу (иначе None)
+Step = Tuple[int, Acts, Optional[Loop]]
+
+
+class MultiParser:
+    # automata -- автоматы (Automaton); диспетчеры действий
+    # автоматов должны быть различными объектами
+    def __init__(self, automata: Sequence[Any]):
+        self.automata = list(automata)
+        self.tables: List[CompiledTable] = [A.table for A in self.automata]
+        # диспетчеры для разбора по таблице (None -- без действий)
+        self.actions = [A._table_actions() for A in self.automata]
+        self.steps = [table.steps_for(actions)
+                      for table, actions in zip(self.tables, self.actions)]
+
+        # лексема -> номер общего класса
+        self.classes: Dict[str, int] = dict()
+        # номер общего класса -> номера классов в таблицах автоматов
+        self.rows: List[Tuple[int, ...]] = []
+        self.__row_ids: Dict[Tuple[int, ...], int] = dict()
+        tokens = set()
+        for table in self.tables:
+            tokens.update(t for t in table.classes if t)
+        for t in sorted(tokens):
+            self.__classify(t)
+        # общие классы символов ASCII по значению байта
+        self.byte_classes: List[int] = [self.__classify(ch) for ch in ASCII]
+
+        # состояния произведения: номер -> состояния автоматов
+        # (смещения строк таблиц)
+        self.products: List[Tuple[Optional[int], ...]] = []
+        self.__product_ids: Dict[Tuple[Optional[int], ...], int] = dict()
+        # переходы произведения: номер состояния -> переходы
+        # по общим классам (None -- переход еще не построен)
+        self.next: List[List[Optional[Step]]] = []
+        # действия в виде функций: (номер автомата, имя действия) -> функция
+        self.__calls: Dict[Tuple[int, str], Callable[[str, str], bool]] = dict()
+        # серии символов петель: (состояние, действия) -> шаблоны
+        self.__loops: Dict[Tuple[int, Acts], Optional[Loop]] = dict()
+        self.start = self.__product(tuple(table.start for table in self.tables))
+        # состояние, в котором все автоматы завершили разбор неудачей
+        self.dead = self.__product(tuple(None for _ in self.tables))
+        self.reset()
+
+    # общий класс лексемы token
+    # символы из диапазонов классифицируются при первой встрече
+    # и запоминаются в classes
+    def __classify(self, token: str) -> int:
+        row = tuple(table.lookup(token) for table in self.tables)
+        k = self.__row_ids.get(row)
+        if k is None:
+            k = self.__row_ids[row] = len(self.rows)
+            self.rows.append(row)
+        self.classes[token] = k
+        return k
+
+    # номер состояния произведения для состояний автоматов states
+    def __product(self, states: Tuple[Optional[int], ...]) -> int:
+        p = self.__product_ids.get(states)
+        if p is None:
+            p = self.__product_ids[states] = len(self.products)
+            self.products.append(states)
+            self.next.append([])
+        return p
+
+    # шаблоны серии символов петли произведения из состояния p
+    # с действиями acts
+    # символ входит в серию, если по нему выполняют петли все живые
+    # автоматы: автоматы без действий -- петли без действий
+    # (CompiledTable.skips_for), автоматы с действиями -- петли с тем же
+    # действием, выполняемым диспетчером серий (CompiledTable.runs_for);
+    # шаблоны автоматов объединяются опережающими проверками re
+    # None, если серию для какого-либо автомата выполнить нельзя
+    def __loop(self, p: int, acts: Acts) -> Optional[Loop]:
+        key = p, acts
+        if key in self.__loops:
+            return self.__loops[key]
+        acting = {i: A for i, _, _, A in acts}
+        patterns: List[Tuple[Any, Any]] = []
+        for i, s in enumerate(self.products[p]):
+            if s is None:
+                continue
+            table = self.tables[i]
+            if i in acting:
+                A = table.action_names.index(acting[i])
+                loop = table.runs_for(self.actions[i]).get((s, A))
+            else:
+                loop = table.skips_for(self.actions[i]).get(s)
+            if loop is None:
+                self.__loops[key] = None
+                return None
+            # шаблоны таблиц имеют вид [символы]*,
+            # байтовые шаблоны состоят из символов ASCII
+            pattern = tuple(None if match is None else match.__self__.pattern[:-1]
+                            for match in loop)
+            pattern = pattern[0], pattern[1] and pattern[1].decode('ascii')
+            if pattern not in patterns:
+                patterns.append(pattern)
+        result: List[Optional[Callable]] = []
+        for kind in (0, 1):
+            items = [pattern[kind] for pattern in patterns]
+            if not items or None in items:
+                result.append(None)
+                continue
+            look = ''.join(f'(?={item})' for item in items[:-1])
+            text = f'(?:{look}{items[-1]})*' if look else items[-1] + '*'
+            result.append(re.compile(text.encode('ascii') if kind else text).match)
+        loop = self.__loops[key] = result[0], result[1]
+        return loop
+
+    # построить переход из состояния произведения p по общему классу k
+    def __step(self, p: int, k: int) -> Step:
+        row = self.rows[k]
+        states = []
+        acts = []
+        for i, s in enumerate(self.products[p]):
+            c = row[i]
+            # автомат уже завершил разбор неудачей либо
+            # встречена лексема не из алфавита
+            if s is None or c < 0:
+                states.append(None)
+                continue
+            new_s, A = self.steps[i][s + c]
+            # нет перехода
+            if new_s < 0:
+                states.append(None)
+                continue
+            states.append(new_s)
+            if A:
+                table = self.tables[i]
+                acts.append((i, self.__bind(i, table.action_names[A]),
+                             table.state_name(s), table.action_names[A]))
+        target = self.__product(tuple(states))
+        acts = tuple(acts)
+        step = target, acts, self.__loop(p, acts) if target == p else None
+        row_p = self.next[p]
+        if len(row_p) <= k:
+            row_p.extend([None] * (len(self.rows) - len(row_p)))
+        row_p[k] = step
+        return step
+
+    # действие A диспетчера автомата с номером i в виде функции
+    # (state, token); связанный метод берется из словаря actions_map
+    # диспетчера, если он есть (как в сгенерированных модулях, см. codegen)
+    def __bind(self, i: int, A: str) -> Callable[[str, str], bool]:
+        call = self.__calls.get((i, A))
+        if call is None:
+            dispatcher = self.actions[i]
+            call = getattr(dispatcher, 'actions_map', {}).get(A)
+            if call is None:
+                call = lambda s, t: dispatcher(s, t, A)
+            self.__calls[i, A] = call
+        return call
+
+    # состояние p, в котором автомат с номером i завершил разбор неудачей
+    # (действие диспетчера вернуло false)
+    def __fail(self, p: int, i: int) -> int:
+        states = list(self.products[p])
+        states[i] = None
+        return self.__product(tuple(states))
+
+    # начать новый разбор: сбросить диспетчеры
+    # и перевести автоматы в начальные состояния
+    def reset(self) -> None:
+        for A in self.automata:
+            A.actions.reset()
+        # текущее состояние произведения
+        self.state = self.start
+        # незавершенный многобайтный символ в конце предыдущей
+        # побайтовой части
+        self.pending = b''
+
+    # состояния автоматов (None -- разбор завершен неудачей)
+    def states(self) -> Tuple[Optional[int], ...]:
+        return self.products[self.state]
+
+    # разобрать вход source (поток лексем/символов либо побайтовый
+    # источник в UTF-8) целиком
+    # возвращает для каждого автомата, допущен ли им вход
+    def parse(self, source: Iterable[str]) -> List[bool]:
+        self.reset()
+        if is_buffer(source):
+            for A in self.automata:
+                A.actions.bind(source)
+        self.feed(source)
+        return self.finish()
+
+    # продолжить разбор очередной частью потока (см. Automaton.Parser)
+    # возвращает false, если разбор всеми автоматами завершился неудачей
+    def feed(self, chunk: Iterable[str]) -> bool:
+        if is_buffer(chunk):
+            if self.pending:
+                chunk = self.pending + bytes(chunk)
+            k = incomplete_tail(chunk)
+            self.pending = bytes(chunk[len(chunk)-k:]) if k else b''
+            if k:
+                chunk = memoryview(chunk)[:len(chunk)-k]
+            self.state = self.__run_bytes(self.state, byte_view(chunk))
+        elif isinstance(chunk, str):
+            self.state = self.__run_text(self.state, chunk)
+        else:
+            self.state = self.__run(self.state, chunk)
+        return self.state != self.dead
+
+    # завершить разбор переходом по концу последовательности
+    # возвращает для каждого автомата, допущен ли им вход
+    def finish(self) -> List[bool]:
+        result = []
+        for i, s in enumerate(self.states()):
+            # поток оборвался посреди символа
+            result.append(s is not None and not self.pending
+                          and self.tables[i].halt_step(s, self.actions[i]))
+        self.state = self.dead
+        return result
+
+    # выполнить переходы из состояния произведения p по лексемам tokens
+    def __run(self, p: int, tokens: Iterable[str]) -> int:
+        classes = self.classes
+        next_ = self.next
+        dead = self.dead
+        for token in tokens:
+            if p == dead:
+                break
+            k = classes.get(token)
+            if k is None:
+                k = self.__classify(token)
+            row = next_[p]
+            step = row[k] if k < len(row) else None
+            if step is None:
+                step = self.__step(p, k)
+            p, acts, _ = step
+            for a in acts:
+                # действие существует и его результат - false
+                if not a[1](a[2], token):
+                    p = self.__fail(p, a[0])
+        return p
+
+    # то же для строки с пропуском серий символов петель без действий
+    # и выполнением действий петель для серий символов
+    def __run_text(self, p: int, text: str) -> int:
+        classes = self.classes
+        next_ = self.next
+        actions = self.actions
+        i = 0
+        n = len(text)
+        dead = self.dead
+        while i < n and p != dead:
+            token = text[i]
+            k = classes.get(token)
+            if k is None:
+                k = self.__classify(token)
+            row = next_[p]
+            step = row[k] if k < len(row) else None
+            if step is None:
+                step = self.__step(p, k)
+            new_p, acts, loop = step
+            if loop is not None and loop[0] is not None:
+                # пропустить серию символов петли целиком,
+                # выполнив ее действия одним вызовом
+                j = loop[0](text, i + 1).end()
+                for a in acts:
+                    if not actions[a[0]].run(a[2], i, j, text[i:j], a[3]):
+                        new_p = self.__fail(new_p, a[0])
+                i = j
+            else:
+                i += 1
+                for a in acts:
+                    # действие существует и его результат - false
+                    if not a[1](a[2], token):
+                        new_p = self.__fail(new_p, a[0])
+            p = new_p
+        return p
+
+    # то же для побайтового источника в кодировке UTF-8
+    # символы ASCII классифицируются по значению байта,
+    # декодируются только многобайтные символы
+    def __run_bytes(self, p: int, mv: memoryview) -> int:
+        classes = self.classes
+        byte_classes = self.byte_classes
+        next_ = self.next
+        actions = self.actions
+        i = 0
+        n = len(mv)
+        dead = self.dead
+        while i < n and p != dead:
+            b = mv[i]
+            if b < 0x80:
+                token = ASCII[b]
+                k = byte_classes[b]
+                width = 1
+            else:
+                width = utf8_length(b) or 1
+                # некорректная последовательность (None)
+                # не входит ни в один алфавит
+                token = decode_char(b, iter(mv[i + 1:i + width]))
+                k = classes.get(token)
+                if k is None:
+                    k = self.__classify(token)
+            row = next_[p]
+            step = row[k] if k < len(row) else None
+            if step is None:
+                step = self.__step(p, k)
+            new_p, acts, loop = step
+            if loop is not None and loop[1] is not None:
+                j = loop[1](mv, i + width).end()
+                for a in acts:
+                    if not actions[a[0]].run(a[2], i, j, bytes(mv[i:j]).decode('utf-8'), a[3]):
+                        new_p = self.__fail(new_p, a[0])
+                i = j
+            else:
+                i += width
+                for a in acts:
+                    # действие существует и его результат - false
+                    if not a[1](a[2], token):
+                        new_p = self.__fail(new_p, a[0])
+            p = new_p
+        return p
+
+
+# разобрать source автоматами automata за один проход
+# (см. MultiParser.parse)
+def parse_many(automata: Sequence[Any], source: Iterable[str]) -> List[bool]:
+    return MultiParser(automata).parse(source)
@@ -0,0 +1,94 @@
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# построение детерминированного автомата по недетерминированному
+# (построение подмножеств)
+# состояние нового автомата -- множество состояний исходного,
+# замкнутое по пустым переходам; его имя -- имя единственного
+# состояния либо имена состояний через запятую в фигурных скобках
+# переходы из множества по группе лексем объединяют переходы
+# входящих в него состояний; все они должны выполнять одно
+# и то же действие (иначе действие перехода не определено)
+# переходы в состояния не из множества состояний (например,
+# в пустую строку) в множества не попадают
+# вид лексемы, допускаемой множеством (см. Automaton.scan), -- вид
+# первого по порядку описания допускающего состояния множества
+# (как в генераторах лексеров: правило, записанное раньше, важнее)
+
+# имя состояния детерминированного автомата
+def subset_name(subset: FrozenSet[str]) -> str:
+    if len(subset) == 1:
+        return next(iter(subset))
+    return '{' + ','.join(sorted(subset)) + '}'
+
+
+# states -- множество состояний исходного автомата
+# start -- начальное состояние
+# moves -- переходы (состояние, группа лексем или None для пустого
+# перехода, состояние, действие)
+# kinds -- виды лексем допускающих состояний в порядке описания
+# возвращает множество состояний, начальное состояние, таблицу
+# переходов (Automaton.TransitionTable) и виды лексем допускающих
+# состояний детерминированного автомата;
+# строятся только достижимые состояния
+def determinize(states: Set[str], start: str,
+                moves: List[Tuple[str, Optional[str], str, str]],
+                kinds: Dict[str, str]):
+    from .automaton import Automaton, DescriptionParseError
+    HALT = Automaton.HALT
+
+    epsilon: Dict[str, Set[str]] = dict()
+    out: Dict[str, Dict[str, List[Tuple[str, str]]]] = {s: dict() for s in states}
+    for s, tg, end, A in moves:
+        if tg is None:
+            epsilon.setdefault(s, set()).add(end)
+        else:
+            out[s].setdefault(tg, []).append((end, A))
+
+    # замыкание множества состояний по пустым переходам
+    def closure(subset: Set[str]) -> FrozenSet[str]:
+        stack = list(subset)
+        result = set(subset)
+        while stack:
+            for t in epsilon.get(stack.pop(), ()):
+                if t not in result:
+                    result.add(t)
+                    stack.append(t)
+        return frozenset(result)
+
+    first = closure({start})
+    names: Dict[FrozenSet[str], str] = {first: subset_name(first)}
+    transitions = dict()
+    work = [first]
+    while work:
+        subset = work.pop()
+        name = names[subset]
+        groups = sorted(set(tg for s in subset for tg in out[s]))
+        for tg in groups:
+            targets = [(end, A) for s in sorted(subset) for end, A in out[s].get(tg, ())]
+            actions = sorted(set(A for _, A in targets))
+            if len(actions) > 1:
+                raise DescriptionParseError('Action conflict encountered at '
+                                            f'{(name, tg)}: {actions}')
+            A = actions[0]
+            # переход по концу последовательности: конечное состояние
+            # не имеет значения
+            if tg == HALT:
+                transitions[name, tg] = HALT, A
+                continue
+            ends = set(end for end, _ in targets if end in states)
+            # все переходы ведут в состояния не из множества состояний
+            if not ends:
+                transitions[name, tg] = HALT, A
+                continue
+            target = closure(ends)
+            if target not in names:
+                names[target] = subset_name(target)
+                work.append(target)
+            transitions[name, tg] = names[target], A
+    priority = {s: i for i, s in enumerate(kinds)}
+    subset_kinds = dict()
+    for subset, name in names.items():
+        accepting = [s for s in subset if s in kinds]
+        if accepting:
+            subset_kinds[name] = kinds[min(accepting, key=priority.get)]
+    return set(names.values()), names[first], transitions, subset_kinds
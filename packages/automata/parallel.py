@@ -0,0 +1,196 @@
+import mmap
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from .source import byte_view, is_buffer, map_file, utf8_length
+from .table import CompiledTable
+
+# параллельный разбор одного большого входа
+# вход делится на части; для каждой части в отдельном процессе
+# вычисляется отображение "состояние на входе -> состояние на выходе"
+# для всех состояний сразу (разбор без действий)
+# композиция отображений дает настоящее состояние на входе каждой части,
+# после чего действия (если они есть) выполняются заново только
+# вдоль настоящего пути
+# побайтовый вход передается путем к файлу: исполнители отображают
+# файл в память сами на время разбора части и получают только границы
+# частей, так что содержимое файла не копируется и не пересылается
+# между процессами (побайтовый источник в памяти разбирается
+# последовательно с предупреждением)
+# действия выполняются последовательным проходом по всему допущенному
+# началу входа, поэтому параллельный разбор быстрее parse только
+# для автоматов без действий
+
+# размер части по умолчанию (в символах для строк, в байтах для буферов)
+CHUNK_SIZE = 1 << 24
+
+# таблица переходов в процессе-исполнителе
+_table: Optional[CompiledTable] = None
+# путь к разбираемому файлу в процессе-исполнителе
+# (None -- части передаются исполнителю целиком)
+_path: Any = None
+
+
+def _init_worker(table: CompiledTable, path: Any) -> None:
+    global _table, _path
+    _table = table
+    _path = path
+
+
+# отображение состояний для части chunk
+# все состояния продвигаются по символам одновременно, пока
+# не сольются в одно (обычно это происходит через несколько символов),
+# остаток части разбирается из этого состояния обычным циклом по таблице
+# возвращает словарь "смещение строки состояния -> смещение строки
+# состояния после части"; состояния, разбор из которых неудачен,
+# в словарь не входят
+def chunk_map(table: CompiledTable, chunk: Any) -> Dict[int, int]:
+    n = table.n_classes
+    # текущее состояние -> состояния на входе, из которых оно достигнуто
+    live: Dict[int, List[int]] = {s: [s] for s in range(0, table.dead * n, n)}
+    buffer = is_buffer(chunk)
+    data = byte_view(chunk) if buffer else chunk
+    pos = 0
+    while len(live) > 1 and pos < len(data):
+        if buffer:
+            width = utf8_length(data[pos]) or 1
+            try:
+                token = bytes(data[pos:pos + width]).decode('utf-8')
+            except UnicodeDecodeError:
+                return dict()
+        else:
+            width = 1
+            token = data[pos]
+        c = table.lookup(token)
+        # встречен символ не из алфавита
+        if c < 0:
+            return dict()
+        new: Dict[int, List[int]] = dict()
+        for s, origins in live.items():
+            end = table.next[s + c]
+            if end >= 0:
+                new.setdefault(end, []).extend(origins)
+        live = new
+        pos += width
+    if len(live) == 1 and pos < len(data):
+        (s, origins), = live.items()
+        rest = data[pos:]
+        end = table.run_bytes(s, rest, None) if buffer else table.run(s, rest, None)
+        live = dict() if end is None else {end: origins}
+    return {o: s for s, origins in live.items() for o in origins}
+
+
+# part -- часть строки либо границы (начало, конец) части файла
+# файл отображается в память только на время разбора части
+def _worker_map(part: Any) -> Dict[int, int]:
+    if _path is None:
+        return chunk_map(_table, part)
+    start, end = part
+    with open(_path, 'rb') as fp:
+        source = map_file(fp)
+    try:
+        with byte_view(source)[start:end] as chunk:
+            return chunk_map(_table, chunk)
+    finally:
+        if isinstance(source, mmap.mmap):
+            source.close()
+
+
+# границы частей побайтового источника source размером около chunk_size
+# (границы не разрывают символы UTF-8)
+def ranges(source: Any, chunk_size: int) -> List[Tuple[int, int]]:
+    mv = byte_view(source)
+    parts = []
+    start = 0
+    while start < len(mv):
+        end = min(start + chunk_size, len(mv))
+        # сдвинуть границу к началу символа
+        while end < len(mv) and end > start and 0x80 <= mv[end] < 0xC0:
+            end -= 1
+        if end == start:
+            end = min(start + chunk_size, len(mv))
+        parts.append((start, end))
+        start = end
+    return parts
+
+
+# разбить строку source на части размером около chunk_size
+def split(source: str, chunk_size: int) -> List[str]:
+    return [source[i:i + chunk_size] for i in range(0, len(source), chunk_size)]
+
+
+# разобрать source (строку или путь к файлу в UTF-8) автоматом automaton,
+# вычисляя отображения состояний частей в workers процессах
+# (по умолчанию -- по числу процессоров)
+# побайтовый источник в памяти (bytes, mmap, memoryview) разбирается
+# последовательно (parse) с предупреждением RuntimeWarning: части
+# пришлось бы копировать в исполнители, а путь к файлу отображения
+# неизвестен (файл следует передавать путем)
+# отображение файла закрывается после разбора, если у автомата нет
+# действий (иначе его получает диспетчер, см. bind)
+# если у автомата есть действия, они выполняются после композиции
+# отображений последовательной подачей частей от начала входа до части,
+# на которой разбор завершается (результаты диспетчера совпадают
+# с результатами parse); такой разбор не быстрее parse
+# возвращает true, если вход допущен
+def parse_parallel(automaton, source: Any, workers: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> bool:
+    if is_buffer(source):
+        warnings.warn('parse_parallel: in-memory buffer is parsed serially, '
+                      'pass a file path instead', RuntimeWarning, stacklevel=3)
+        return automaton.parse(source)
+    if not isinstance(source, os.PathLike):
+        return _parse_parts(automaton, None, source, split(source, chunk_size),
+                            workers)
+    with open(source, 'rb') as fp:
+        buf = map_file(fp)
+    try:
+        return _parse_parts(automaton, source, buf, ranges(buf, chunk_size), workers)
+    finally:
+        if isinstance(buf, mmap.mmap) and automaton._table_actions() is None:
+            # после исключения на части отображения еще ссылается
+            # трассировка, и оно закроется при ее удалении
+            try:
+                buf.close()
+            except BufferError:
+                pass
+
+
+# разбор частей parts источника source (строки либо отображения
+# файла path; для файла части -- границы (начало, конец))
+def _parse_parts(automaton, path: Any, source: Any, parts: List[Any],
+                 workers: Optional[int]) -> bool:
+    table = automaton.table
+    if path is None:
+        chunks = parts
+    else:
+        mv = byte_view(source)
+        chunks = [mv[start:end] for start, end in parts]
+    workers = workers or os.cpu_count() or 1
+    if len(chunks) > 1 and workers > 1:
+        with ProcessPoolExecutor(min(workers, len(chunks)), initializer=_init_worker,
+                                 initargs=(table, path)) as pool:
+            maps = list(pool.map(_worker_map, parts))
+    else:
+        maps = [chunk_map(table, chunk) for chunk in chunks]
+
+    # композиция отображений вдоль настоящего пути
+    s: Optional[int] = table.start
+    reached = 0
+    for m in maps:
+        s = m.get(s)
+        reached += 1
+        if s is None:
+            break
+    if automaton._table_actions() is None:
+        return s is not None and table.halt_step(s, None)
+
+    # выполнить действия для частей настоящего пути
+    P = automaton.parser()
+    if is_buffer(source):
+        automaton.actions.bind(source)
+    for chunk in chunks[:reached]:
+        if not P.feed(chunk):
+            return False
+    return P.finish()
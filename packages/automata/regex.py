@@ -0,0 +1,144 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from .source import is_buffer
+from .table import CompiledTable
+
+# преобразование автомата без действий в регулярное выражение re
+# автомат, используемый только для распознавания (с диспетчером
+# NilFunction), проверяет строку одним вызовом re.fullmatch
+# выражение строится исключением состояний обобщенного автомата,
+# переходы которого помечены регулярными выражениями
+# выражение представлено парой (текст, является ли атомом),
+# атомы не требуют скобок перед '*'
+
+# наибольшая длина выражения; если при исключении состояний
+# выражение становится длиннее, автомат разбирается по таблице
+# (длинные выражения с многими альтернативами сопоставляются
+# с возвратами медленнее цикла по таблице)
+LIMIT = 1 << 12
+
+Regex = Tuple[str, bool]
+
+
+# объединение выражений (None -- пустое множество)
+def _alt(a: Optional[Regex], b: Optional[Regex]) -> Optional[Regex]:
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    return f'(?:{a[0]}|{b[0]})', True
+
+
+# конкатенация выражений
+def _cat(*xs: Regex) -> Regex:
+    xs = [x for x in xs if x[0]]
+    if len(xs) == 1:
+        return xs[0]
+    return ''.join(x[0] for x in xs), False
+
+
+# итерация выражения
+def _star(x: Optional[Regex]) -> Regex:
+    if x is None or not x[0]:
+        return '', True
+    if x[1]:
+        return x[0] + '*', False
+    return f'(?:{x[0]})*', False
+
+
+# класс символов re для классов лексем cs таблицы table
+# (None, если в классы не входит ни одного символа)
+def _char_class(table: CompiledTable, cs: List[int]) -> Optional[Regex]:
+    ranges = [(lo, hi) for lo, hi, c in zip(table.range_starts, table.range_ends,
+                                            table.range_classes) if c in cs]
+    # символы из диапазонов (запомненные в classes) повторно не перечисляются
+    chars = sorted(set(t for t, c in table.classes.items() if c in cs and len(t) == 1
+                       and table.range_class(t) is None))
+    if not ranges and len(chars) == 1:
+        return re.escape(chars[0]), True
+    items = [re.escape(t) for t in chars]
+    items += [f'{re.escape(lo)}-{re.escape(hi)}' for lo, hi in ranges]
+    if not items:
+        return None
+    return f'[{"".join(items)}]', True
+
+
+# регулярное выражение, распознающее строки, которые автомат
+# с таблицей table принимает без действий
+# возвращает None, если выражение получается длиннее LIMIT
+def to_pattern(table: CompiledTable) -> Optional[str]:
+    n = table.n_classes
+    # состояния обобщенного автомата: номера состояний таблицы,
+    # а также новые начальное и заключительное состояния
+    S, F = -1, -2
+    # edges[p][q] -- выражение перехода из p в q,
+    # back[q] -- состояния, из которых есть переход в q
+    edges: Dict[int, Dict[int, Regex]] = {S: dict()}
+    back: Dict[int, Set[int]] = {F: set()}
+    for i in range(table.dead):
+        edges[i] = dict()
+        back[i] = set()
+    for i in range(table.dead):
+        targets: Dict[int, List[int]] = dict()
+        for c in range(n):
+            end = table.next[i * n + c]
+            # переходы в мертвое состояние не ведут к допуску
+            if end >= 0 and end // n != table.dead:
+                targets.setdefault(end // n, []).append(c)
+        for j, cs in targets.items():
+            label = _char_class(table, cs)
+            if label is not None:
+                edges[i][j] = label
+                back[j].add(i)
+        # состояние допускающее, если из него есть переход
+        # по концу последовательности
+        if table.next[i * n + table.halt] >= 0:
+            edges[i][F] = '', True
+            back[F].add(i)
+    start = table.start // n
+    edges[S][start] = '', True
+    back[start].add(S)
+
+    remaining = set(range(table.dead))
+    while remaining:
+        # исключить состояние с наименьшим числом новых переходов
+        k = min(remaining, key=lambda k: (len(back[k] - {k}) * len(set(edges[k]) - {k}), k))
+        remaining.remove(k)
+        loop = _star(edges[k].pop(k, None))
+        back[k].discard(k)
+        for p in back[k]:
+            into = edges[p].pop(k)
+            for q, out in edges[k].items():
+                new = _alt(edges[p].get(q), _cat(into, loop, out))
+                if len(new[0]) > LIMIT:
+                    return None
+                edges[p][q] = new
+                back[q].add(p)
+        for q in edges[k]:
+            back[q].discard(k)
+        del edges[k], back[k]
+    result = edges[S].get(F)
+    # автомат не допускает ни одной строки
+    if result is None:
+        return '(?!)'
+    return result[0]
+
+
+# функция распознавания строк и побайтовых источников в UTF-8
+# для автомата с таблицей table (None, если выражение слишком длинное)
+# функция возвращает true, если автомат принимает вход
+def recognizer(table: CompiledTable) -> Optional[Callable[[Any], bool]]:
+    pattern = to_pattern(table)
+    if pattern is None:
+        return None
+    fullmatch = re.compile(pattern).fullmatch
+
+    def recognize(text: Any) -> bool:
+        if is_buffer(text):
+            try:
+                text = bytes(text).decode('utf-8')
+            except UnicodeDecodeError:
+                return False
+        return fullmatch(text) is not None
+
+    return recognize
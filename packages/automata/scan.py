@@ -0,0 +1,119 @@
+from typing import Any, Iterator, Tuple
+from .source import byte_view, is_buffer, utf8_length
+from .table import CompiledTable
+
+# разбиение входа на лексемы по наибольшему совпадению
+# лексема начинается в начальном состоянии автомата и продолжается,
+# пока есть переходы; ее концом считается последняя позиция,
+# в которой автомат находился в допускающем состоянии
+# (состоянии с видом лексемы, см. Automaton.kinds), после чего
+# разбор следующей лексемы начинается с этой позиции
+# действия и переходы по концу последовательности не выполняются
+
+# запись о лексеме: (вид, начало, конец)
+# позиции -- в символах для строк, в байтах для побайтовых источников
+Record = Tuple[str, int, int]
+
+
+# ни один префикс входа, начиная с позиции position, не является лексемой
+class ScanError(Exception):
+    def __init__(self, position: int):
+        super().__init__(f'No token matches at position {position}')
+        self.position = position
+
+
+# разбить строку text на лексемы автоматом с таблицей table
+# серии символов петель (см. CompiledTable.bare_skips)
+# пропускаются за один шаг
+def scan_text(table: CompiledTable, text: str) -> Iterator[Record]:
+    classes = table.classes
+    next_ = table.next
+    skips = table.bare_skips
+    accepting = table.accepting
+    n = len(text)
+    i = 0
+    while i < n:
+        s = table.start
+        j = i
+        # конец и вид последней допущенной лексемы
+        last = i
+        kind = None
+        while j < n:
+            c = classes.get(text[j])
+            if c is None:
+                c = table.range_class(text[j])
+                # встречен символ не из алфавита
+                if c is None:
+                    break
+            new_s = next_[s + c]
+            # нет перехода
+            if new_s < 0:
+                break
+            j += 1
+            if new_s == s:
+                skip = skips.get(s)
+                if skip is not None:
+                    j = skip[0](text, j).end()
+            s = new_s
+            if s in accepting:
+                last = j
+                kind = accepting[s]
+        if kind is None:
+            raise ScanError(i)
+        yield kind, i, last
+        i = last
+
+
+# то же для побайтового источника в кодировке UTF-8
+def scan_bytes(table: CompiledTable, buf: Any) -> Iterator[Record]:
+    mv = byte_view(buf)
+    byte_classes = table.byte_classes
+    next_ = table.next
+    skips = table.bare_skips
+    accepting = table.accepting
+    n = len(mv)
+    i = 0
+    while i < n:
+        s = table.start
+        j = i
+        last = i
+        kind = None
+        while j < n:
+            b = mv[j]
+            if b < 0x80:
+                c = byte_classes[b]
+                width = 1
+            else:
+                width = utf8_length(b)
+                try:
+                    token = bytes(mv[j:j + width]).decode('utf-8') if width else None
+                except UnicodeDecodeError:
+                    token = None
+                c = CompiledTable.NONE if token is None else table.lookup(token)
+            # встречен символ не из алфавита
+            if c < 0:
+                break
+            new_s = next_[s + c]
+            # нет перехода
+            if new_s < 0:
+                break
+            j += width
+            if new_s == s:
+                skip = skips.get(s)
+                if skip is not None and skip[1] is not None:
+                    j = skip[1](mv, j).end()
+            s = new_s
+            if s in accepting:
+                last = j
+                kind = accepting[s]
+        if kind is None:
+            raise ScanError(i)
+        yield kind, i, last
+        i = last
+
+
+# разбить строку или побайтовый источник на лексемы
+def scan(table: CompiledTable, source: Any) -> Iterator[Record]:
+    if is_buffer(source):
+        return scan_bytes(table, source)
+    return scan_text(table, source)
@@ -0,0 +1,115 @@
+import mmap
+import os
+from typing import Any, Iterator, Union
+
+# побайтовые источники: разбираются без предварительного
+# декодирования всего содержимого в строку
+# ожидается текст в кодировке ASCII или UTF-8
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+# односимвольные строки для байтов ASCII
+# (чтобы не создавать строку на каждый символ)
+ASCII = tuple(chr(i) for i in range(128))
+
+
+# является ли источник побайтовым
+def is_buffer(source: Any) -> bool:
+    return isinstance(source, BUFFER_TYPES)
+
+
+# представление буфера в виде последовательности байтов (целых чисел)
+def byte_view(buf: Buffer) -> memoryview:
+    mv = memoryview(buf)
+    return mv if mv.format == 'B' else mv.cast('B')
+
+
+# длина последовательности UTF-8 по ведущему байту
+# 0 -- байт не может начинать последовательность
+def utf8_length(lead: int) -> int:
+    if lead < 0x80:
+        return 1
+    if lead < 0xC0:
+        return 0
+    if lead < 0xE0:
+        return 2
+    if lead < 0xF0:
+        return 3
+    if lead < 0xF8:
+        return 4
+    return 0
+
+
+# декодировать многобайтный символ с ведущим байтом lead,
+# продолжение которого берется из итератора байтов it
+# возвращает None, если последовательность некорректна
+def decode_char(lead: int, it: Iterator[int]) -> Any:
+    n = utf8_length(lead)
+    if n < 2:
+        return None
+    seq = bytearray([lead])
+    for _ in range(n - 1):
+        b = next(it, None)
+        if b is None:
+            return None
+        seq.append(b)
+    try:
+        return seq.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+
+# количество байтов в конце буфера, образующих
+# незавершенную последовательность UTF-8
+# (при подаче потока частями такие байты переносятся в следующую часть)
+def incomplete_tail(buf: Buffer) -> int:
+    mv = byte_view(buf)
+    # ведущий байт находится не далее трех байтов от конца
+    for k in range(1, min(4, len(mv)) + 1):
+        b = mv[-k]
+        # байт продолжения -- смотреть дальше
+        if 0x80 <= b < 0xC0:
+            continue
+        n = utf8_length(b)
+        return k if n > k else 0
+    return 0
+
+
+# последовательность символов буфера
+# некорректная последовательность UTF-8 завершает итерацию
+# символом замены U+FFFD
+def iter_chars(buf: Buffer) -> Iterator[str]:
+    it = iter(byte_view(buf))
+    for b in it:
+        if b < 0x80:
+            yield ASCII[b]
+        else:
+            ch = decode_char(b, it)
+            if ch is None:
+                yield '\ufffd'
+                return
+            yield ch
+
+
+# количество байтов, занимаемых символом в UTF-8
+def char_width(t: str) -> int:
+    return 1 if t < '\x80' else len(t.encode('utf-8'))
+
+
+# текст лексемы с позиции start до позиции end источника
+# (смещения в байтах для побайтовых источников и в символах для строк)
+def source_text(source: Any, start: int, end: int) -> str:
+    if isinstance(source, str):
+        return source[start:end]
+    return bytes(source[start:end]).decode('utf-8')
+
+
+# отобразить открытый в двоичном режиме файл в память
+# (единственный способ отображения файлов в пакете, см. parallel)
+# пустой файл отобразить нельзя, для него возвращается пустой буфер
+# отображение остается действительным после закрытия файла;
+# закрывает его вызывающий, когда на него не осталось memoryview
+def map_file(fp) -> Buffer:
+    if not os.fstat(fp.fileno()).st_size:
+        return b''
+    return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
@@ -0,0 +1,374 @@
+import re
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, List, Iterable, Optional, Set, Tuple
+from .dispatcher import AutomatonActionDispatcher, AutomatonRunDispatcher
+from .source import ASCII, Buffer, byte_view, decode_char, utf8_length
+
+
+# скомпилированная таблица переходов автомата
+# состояния, классы лексем и действия пронумерованы целыми числами,
+# класс лексем объединяет группы лексем с одинаковыми переходами,
+# переходы хранятся в плоских массивах размером
+# (число состояний + 1) * (число классов)
+# строка таблицы для состояния с номером i начинается со смещения
+# i * (число классов); состояния при разборе представлены смещениями строк
+class CompiledTable:
+    # отсутствие перехода
+    NONE = -1
+
+    # automaton -- автомат (Automaton) с разобранным описанием
+    def __init__(self, automaton):
+        # состояния нумеруются в порядке сортировки имен,
+        # чтобы таблица не зависела от порядка обхода множества
+        self.state_names: List[str] = sorted(automaton.states)
+        # мертвое состояние: в него ведут переходы в состояния
+        # не из множества состояний (например, в пустую строку);
+        # переходов из него нет
+        self.dead: int = len(self.state_names)
+        self.state_names.append(automaton.HALT)
+        state_ids: Dict[str, int] = {s: i for i, s in enumerate(self.state_names)
+                                     if i != self.dead}
+
+        # имена действий, отсутствию действия соответствует номер 0
+        self.action_names: List[str] = ['']
+        action_ids: Dict[str, int] = {'': 0}
+
+        # группы лексем в порядке первого появления
+        groups: List[str] = list(dict.fromkeys(
+            list(automaton.token_map.values()) +
+            [tg for _, _, tg in automaton.token_ranges]))
+        # столбцы таблицы для групп: номер состояния -> (переход, действие)
+        columns: Dict[str, Dict[int, Tuple[int, int]]] = {tg: dict() for tg in groups}
+        for (s, tg), (end, A) in automaton.transitions.items():
+            if A not in action_ids:
+                action_ids[A] = len(self.action_names)
+                self.action_names.append(A)
+            columns[tg][state_ids[s]] = state_ids.get(end, self.dead), action_ids[A]
+
+        # сжатие алфавита: группы, переходы по которым совпадают
+        # во всех состояниях, объединяются в один класс
+        signatures: Dict[tuple, int] = dict()
+        # номер класса для каждой группы лексем
+        self.group_class: Dict[str, int] = dict()
+        for tg in groups:
+            sig = tuple(sorted(columns[tg].items()))
+            self.group_class[tg] = signatures.setdefault(sig, len(signatures))
+        self.n_classes: int = len(signatures)
+        # отображение лексем в номера классов
+        self.classes: Dict[str, int] = {t: self.group_class[tg]
+                                        for t, tg in automaton.token_map.items()}
+        # диапазоны односимвольных лексем: начала, концы и классы
+        # соседние диапазоны одного класса сливаются
+        self.range_starts: List[str] = []
+        self.range_ends: List[str] = []
+        self.range_classes: List[int] = []
+        for lo, hi, tg in automaton.token_ranges:
+            c = self.group_class[tg]
+            if (self.range_ends and self.range_classes[-1] == c
+                    and ord(self.range_ends[-1]) + 1 == ord(lo)):
+                self.range_ends[-1] = hi
+            else:
+                self.range_starts.append(lo)
+                self.range_ends.append(hi)
+                self.range_classes.append(c)
+        # классы символов ASCII по значению байта
+        # (NONE для символов не из алфавита)
+        self.byte_classes: List[int] = [self.lookup(ch) for ch in ASCII]
+        # класс конца последовательности
+        self.halt: int = self.group_class[automaton.HALT]
+        self.halt_token: str = automaton.HALT
+
+        n = self.n_classes
+        size = len(self.state_names) * n
+        # смещение строки состояния, в которое выполняется переход
+        self.next = array('i', [CompiledTable.NONE]) * size
+        # номер действия, выполняемого при переходе
+        self.action = array('i', [0]) * size
+        for sig, c in signatures.items():
+            for s, (end, A) in sig:
+                self.next[s * n + c] = end * n
+                self.action[s * n + c] = A
+        self.start: int = state_ids[automaton.start_state] * n
+        # допускающие состояния для разбиения на лексемы:
+        # смещение строки состояния -> вид лексемы
+        self.accepting: Dict[int, str] = {state_ids[s] * n: kind
+                                          for s, kind in automaton.kinds.items()}
+        # те же переходы в виде списка пар (смещение, действие)
+        # для циклов разбора: обращение к списку дешевле,
+        # чем к двум массивам
+        self.steps: List[Tuple[int, int]] = list(zip(self.next, self.action))
+        # переходы без действий, если диспетчер действий не нужен
+        self.bare_steps: List[Tuple[int, int]] = [(x, 0) for x in self.next]
+
+        # петли: переходы состояния в само себя
+        # серия символов, по которым выполняются петли без действий,
+        # пропускается за один шаг сопоставлением с классом символов re
+        # смещение строки состояния -> (метод match для строк,
+        # метод match для байтов либо None)
+        self.skips: Dict[int, Tuple[Callable, Optional[Callable]]] = dict()
+        # то же для разбора без действий (любые петли)
+        self.bare_skips: Dict[int, Tuple[Callable, Optional[Callable]]] = dict()
+        # петли с действиями: серия символов, по которым выполняются
+        # петли одного состояния с одним действием, передается диспетчеру
+        # серий (AutomatonRunDispatcher) одним вызовом
+        # (смещение строки состояния, номер действия) -> шаблоны, как в skips
+        self.run_loops: Dict[Tuple[int, int], Tuple[Callable, Optional[Callable]]] = dict()
+        for i in range(self.dead):
+            s = i * n
+            loops = [c for c in range(n) if c != self.halt and self.next[s + c] == s]
+            for skips, cs in ((self.skips, [c for c in loops if not self.action[s + c]]),
+                              (self.bare_skips, loops)):
+                skip = self.__loop_pattern(set(cs))
+                if skip is not None:
+                    skips[s] = skip
+            for A in set(self.action[s + c] for c in loops) - {0}:
+                run = self.__loop_pattern(set(c for c in loops if self.action[s + c] == A))
+                if run is not None:
+                    self.run_loops[s, A] = run
+
+    # шаблоны re для серий символов классов loops
+    # возвращает пару (match для строк, match для байтов либо None)
+    # или None, если ни один символ в классы не входит
+    def __loop_pattern(self, loops: Set[int]) -> Optional[Tuple[Callable, Optional[Callable]]]:
+        if not loops:
+            return None
+        chars = sorted(t for t, c in self.classes.items() if c in loops and len(t) == 1)
+        ranges = [(lo, hi) for lo, hi, c in zip(self.range_starts, self.range_ends,
+                                                self.range_classes) if c in loops]
+        items = [re.escape(t) for t in chars]
+        items += [f'{re.escape(lo)}-{re.escape(hi)}' for lo, hi in ranges]
+        if not items:
+            return None
+        text = re.compile(f'[{"".join(items)}]*').match
+        # в байтовом шаблоне -- только символы ASCII
+        ascii_items = [re.escape(t) for t in chars if t < '\x80']
+        ascii_items += [f'{re.escape(lo)}-{re.escape(min(hi, chr(0x7F)))}'
+                        for lo, hi in ranges if lo < '\x80']
+        binary = None
+        if ascii_items:
+            binary = re.compile(f'[{"".join(ascii_items)}]*'.encode('ascii')).match
+        return text, binary
+
+    # петли, серии символов которых можно пропускать
+    # при разборе с диспетчером actions
+    def skips_for(self, actions: Optional[AutomatonActionDispatcher]) -> Dict[int, Tuple[Callable, Optional[Callable]]]:
+        return self.bare_skips if actions is None else self.skips
+
+    # петли с действиями, которые диспетчер actions
+    # выполняет для серий символов (пустой словарь, если диспетчер
+    # не поддерживает серии)
+    def runs_for(self, actions: Optional[AutomatonActionDispatcher]) -> Dict[Tuple[int, int], Tuple[Callable, Optional[Callable]]]:
+        if not isinstance(actions, AutomatonRunDispatcher):
+            return dict()
+        names = self.action_names
+        return {k: run for k, run in self.run_loops.items()
+                if names[k[1]] in actions.run_actions}
+
+    # переходы для разбора с диспетчером actions
+    # actions равен None, если действия выполнять не нужно
+    def steps_for(self, actions: Optional[AutomatonActionDispatcher]) -> List[Tuple[int, int]]:
+        return self.bare_steps if actions is None else self.steps
+
+    # класс односимвольной лексемы из диапазонов
+    # (None, если лексема в диапазоны не входит)
+    # найденный класс запоминается в classes, так что повторные
+    # вхождения символа определяются одним обращением к словарю
+    def range_class(self, token: str) -> Optional[int]:
+        if not self.range_starts or not isinstance(token, str) or len(token) != 1:
+            return None
+        i = bisect_right(self.range_starts, token) - 1
+        if i < 0 or token > self.range_ends[i]:
+            return None
+        c = self.range_classes[i]
+        self.classes[token] = c
+        return c
+
+    # класс лексемы (NONE, если лексема не из алфавита)
+    def lookup(self, token: str) -> int:
+        c = self.classes.get(token)
+        if c is None:
+            c = self.range_class(token)
+        return CompiledTable.NONE if c is None else c
+
+    # имя состояния по смещению строки
+    def state_name(self, s: int) -> str:
+        return self.state_names[s // self.n_classes]
+
+    # выполнить переходы из состояния s по лексемам из token_stream
+    # actions -- диспетчер действий (None -- действия не выполняются)
+    # возвращает смещение строки нового состояния
+    # или None, если разбор завершился неудачей
+    def run(self, s: int, token_stream: Iterable[str],
+            actions: Optional[AutomatonActionDispatcher]) -> Optional[int]:
+        if isinstance(token_stream, str) and (self.skips_for(actions)
+                                              or self.runs_for(actions)):
+            return self.run_text(s, token_stream, actions)
+        classes = self.classes
+        steps = self.steps_for(actions)
+        names = self.action_names
+        for token in token_stream:
+            c = classes.get(token)
+            if c is None:
+                c = self.range_class(token)
+                # встречена лексема не из алфавита
+                if c is None:
+                    return None
+            new_s, A = steps[s + c]
+            # нет перехода
+            if new_s < 0:
+                return None
+            # действие существует и его результат - false
+            if A and not actions(self.state_name(s), token, names[A]):
+                return None
+            s = new_s
+        return s
+
+    # то же, что run, но для строки с пропуском серий символов,
+    # по которым выполняются петли без действий (см. skips),
+    # и выполнением действий петель для серий символов (см. run_loops)
+    def run_text(self, s: int, text: str,
+                 actions: Optional[AutomatonActionDispatcher]) -> Optional[int]:
+        classes = self.classes
+        steps = self.steps_for(actions)
+        skips = self.skips_for(actions)
+        runs = self.runs_for(actions)
+        names = self.action_names
+        i = 0
+        n = len(text)
+        while i < n:
+            token = text[i]
+            c = classes.get(token)
+            if c is None:
+                c = self.range_class(token)
+                # встречен символ не из алфавита
+                if c is None:
+                    return None
+            new_s, A = steps[s + c]
+            # нет перехода
+            if new_s < 0:
+                return None
+            if new_s == s and not A:
+                skip = skips.get(s)
+                # пропустить серию символов петли целиком
+                if skip is not None:
+                    i = skip[0](text, i + 1).end()
+                    continue
+            elif new_s == s and (s, A) in runs:
+                # выполнить действие для всей серии символов петли
+                j = runs[s, A][0](text, i + 1).end()
+                if not actions.run(self.state_name(s), i, j, text[i:j], names[A]):
+                    return None
+                i = j
+                continue
+            # действие существует и его результат - false
+            elif A and not actions(self.state_name(s), token, names[A]):
+                return None
+            s = new_s
+            i += 1
+        return s
+
+    # то же, что run, но для побайтового источника в кодировке UTF-8
+    # символы ASCII классифицируются по значению байта,
+    # декодируются только многобайтные символы
+    def run_bytes(self, s: int, buf: Buffer,
+                  actions: Optional[AutomatonActionDispatcher]) -> Optional[int]:
+        skips = {s: skip[1] for s, skip in self.skips_for(actions).items()
+                 if skip[1] is not None}
+        runs = {k: run[1] for k, run in self.runs_for(actions).items()
+                if run[1] is not None}
+        if skips or runs:
+            return self.__run_bytes_skipping(s, byte_view(buf), actions, skips, runs)
+        classes = self.classes
+        byte_classes = self.byte_classes
+        steps = self.steps_for(actions)
+        names = self.action_names
+        it = iter(byte_view(buf))
+        for b in it:
+            if b < 0x80:
+                c = byte_classes[b]
+                # встречен символ не из алфавита
+                if c < 0:
+                    return None
+                token = ASCII[b]
+            else:
+                token = decode_char(b, it)
+                c = classes.get(token)
+                if c is None:
+                    c = self.range_class(token)
+                    if c is None:
+                        return None
+            new_s, A = steps[s + c]
+            # нет перехода
+            if new_s < 0:
+                return None
+            # действие существует и его результат - false
+            if A and not actions(self.state_name(s), token, names[A]):
+                return None
+            s = new_s
+        return s
+
+    # то же, что run_bytes, с пропуском серий символов ASCII,
+    # по которым выполняются петли без действий,
+    # и выполнением действий петель для серий символов ASCII
+    # skips -- смещение строки состояния -> match байтового шаблона
+    # runs -- (смещение строки состояния, номер действия) -> match
+    def __run_bytes_skipping(self, s: int, mv: memoryview,
+                             actions: Optional[AutomatonActionDispatcher],
+                             skips: Dict[int, Callable],
+                             runs: Dict[Tuple[int, int], Callable]) -> Optional[int]:
+        classes = self.classes
+        byte_classes = self.byte_classes
+        steps = self.steps_for(actions)
+        names = self.action_names
+        i = 0
+        n = len(mv)
+        while i < n:
+            b = mv[i]
+            if b < 0x80:
+                c = byte_classes[b]
+                # встречен символ не из алфавита
+                if c < 0:
+                    return None
+                token = ASCII[b]
+                width = 1
+            else:
+                width = utf8_length(b)
+                token = decode_char(b, iter(mv[i + 1:i + width]))
+                c = classes.get(token)
+                if c is None:
+                    c = self.range_class(token)
+                    if c is None:
+                        return None
+            new_s, A = steps[s + c]
+            # нет перехода
+            if new_s < 0:
+                return None
+            if new_s == s and not A:
+                skip = skips.get(s)
+                # пропустить серию символов петли целиком
+                if skip is not None:
+                    i = skip(mv, i + width).end()
+                    continue
+            elif new_s == s and (s, A) in runs:
+                # выполнить действие для всей серии символов петли
+                j = runs[s, A](mv, i + width).end()
+                text = bytes(mv[i:j]).decode('utf-8')
+                if not actions.run(self.state_name(s), i, j, text, names[A]):
+                    return None
+                i = j
+                continue
+            # действие существует и его результат - false
+            elif A and not actions(self.state_name(s), token, names[A]):
+                return None
+            s = new_s
+            i += width
+        return s
+
+    # выполнить переход из состояния s по концу последовательности
+    def halt_step(self, s: int, actions: Optional[AutomatonActionDispatcher]) -> bool:
+        new_s, A = self.steps_for(actions)[s + self.halt]
+        if new_s < 0:
+            return False
+        return not A or actions(self.state_name(s), self.halt_token,
+                                self.action_names[A])
@@ -1,2 +1,3 @@
 from .c_stt import STTDispatcher
-from .c_ttr import TTRDispatcher
\ No newline at end of file
+from .c_ttr import TTRDispatcher
+from .tokens import TokenRecords
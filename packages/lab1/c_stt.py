@@ -1,47 +1,92 @@
-from ..automata import AutomatonActionDispatcher
-from typing import List, Tuple, Dict, Callable, Any
+from array import array
+from ..automata import AutomatonRunDispatcher
+from ..automata.source import char_width, source_text
+from .tokens import KEYWORDS, KIND_IDS, TokenRecords, kind_of
+from typing import List, Dict, Callable, Any
 
-class STTDispatcher(AutomatonActionDispatcher):
+class STTDispatcher(AutomatonRunDispatcher):
     # список ключевых слов языка
-    keywords = ['long', 'short', 'int', 'double',
-                'float', 'bool', 'char']
+    keywords = list(KEYWORDS)
     # аннотации типов
-    FilePos = Tuple[int, int]
     Inner = Callable[[str, str], bool]
+    RunInner = Callable[[str, int, int, str], bool]
+    # действия, выполняемые для серии символов
+    run_actions = frozenset(['add_char'])
 
     def reset(self) -> None:
         self._stream: List[str] = []
         self.buffer: List[str] = []
-        self.line = 1
-        self.column = 1
-        self.current_token_pos: STTDispatcher.FilePos = (self.line, self.column)
-        self._token_pos: List[STTDispatcher.FilePos] = []
+        # смещения начал лексем из потока
+        # (строки и столбцы вычисляются по ним при необходимости,
+        # см. automata.lines.LineIndex)
+        self._token_offsets = array('q')
+        # разбираемый источник (см. bind)
+        # если задан, текст лексем берется его срезами,
+        # а символы в буфер не накапливаются
+        self.source: Any = None
+        # смещение текущего символа в источнике
+        # и функция вычисления ширины символа
+        self.offset = 0
+        self.width: Callable[[str], int] = len
+        # смещение начала разбираемой лексемы (-1 -- лексемы нет)
+        self.token_start = -1
+        # записи о лексемах в компактном режиме (см. tokens)
+        self.records = TokenRecords()
 
-    def __init__(self):
-        self.reset()
+    def bind(self, source: Any) -> None:
+        self.source = source
+        self.records.source = source
+        # смещения в побайтовом источнике считаются в байтах
+        self.width = char_width
 
-    def __call__(self, s: str, t: str, A: str) -> bool:
-        # создаем словарь связанных методов
-        actions_map: Dict[str, STTDispatcher.Inner] = {
+    # compact -- компактный режим: лексемы записываются в records
+    # (по записи на лексему) вместо потока token_stream, в котором
+    # неключевое слово занимает по элементу на символ
+    def __init__(self, compact: bool = False):
+        self.compact = compact
+        # словари связанных методов
+        self.actions_map: Dict[str, STTDispatcher.Inner] = {
             'add_char': self.add_char,
             'append': self.append,
             'delim_char': self.delim_char
         }
-        # и вызываем нужный
-        return actions_map[A](s, t)
+        self.run_map: Dict[str, STTDispatcher.RunInner] = {
+            'add_char': self.add_chars
+        }
+        self.reset()
+
+    def __call__(self, s: str, t: str, A: str) -> bool:
+        return self.actions_map[A](s, t)
+
+    def run(self, s: str, start: int, end: int, t: str, A: str) -> bool:
+        return self.run_map[A](s, start, end, t)
 
     # продвинуть позицию в файле вперед
     def _advance_char(self, t: str) -> None:
-        if t == '\n':
-            self.line += 1
-            self.column = 1
+        self.offset += 1 if t < '\x80' else self.width(t)
+
+    # текст разбираемой лексемы
+    # (срез источника либо содержимое буфера)
+    def _token_text(self) -> str:
+        if self.source is None:
+            text = ''.join(self.buffer)
+            self.buffer.clear()
         else:
-            self.column += 1
+            text = source_text(self.source, self.token_start, self.offset)
+        self.token_start = -1
+        return text
 
     # добавить лексему или набор символов в поток
     def _append_to_stream(self) -> None:
-        if self.buffer:
-            str = ''.join(self.buffer)
+        if self.token_start >= 0:
+            start = self.token_start
+            str = self._token_text()
+            if self.compact:
+                kind = kind_of(str)
+                self.records.append(kind, start, self.offset - start,
+                                    str if self.source is None and
+                                    kind >= len(KEYWORDS) else None)
+                return
             if str in STTDispatcher.keywords:
                 self._stream.append(str)
             else:
@@ -49,9 +94,8 @@ class STTDispatcher(AutomatonActionDispatcher):
                 # вставить спец. лексему
                 # иначе идущие подряд идентификаторы будут сливаться в один
                 self._stream.append('nkw')
-                self._stream += self.buffer
-            self.token_pos.append(self.current_token_pos)
-            self.buffer.clear()
+                self._stream += str
+            self._token_offsets.append(start)
 
     # при встрече разделителя
     def delim_char(self, s: str, t: str) -> bool:
@@ -63,36 +107,56 @@ class STTDispatcher(AutomatonActionDispatcher):
     def append(self, s: str, t: str) -> bool:
         # добавить лексему
         self._append_to_stream()
-        # добавить позицию знака
-        self.token_pos.append((self.line, self.column))
-        # добавить знак в поток
-        self._stream.append(t)
+        if self.compact:
+            self.records.append(KIND_IDS[t], self.offset, 1)
+        else:
+            # добавить смещение знака
+            self._token_offsets.append(self.offset)
+            # добавить знак в поток
+            self._stream.append(t)
         self._advance_char(t)
         return True
 
     # добавить символ в буфер
     def add_char(self, s: str, t: str) -> bool:
-        # если буфер пуст, позиция текущего (первого) символа
+        # если лексема только начинается, позиция текущего (первого) символа
         # будет позицией лексемы
-        if not self.buffer:
-            self.current_token_pos = (self.line, self.column)
-        self.buffer.append(t)
+        if self.token_start < 0:
+            self.token_start = self.offset
+        if self.source is None:
+            self.buffer.append(t)
         self._advance_char(t)
         return True
 
+    # добавить в буфер серию символов, занимающую
+    # позиции с start до end
+    def add_chars(self, s: str, start: int, end: int, t: str) -> bool:
+        if self.token_start < 0:
+            self.token_start = self.offset
+        if self.source is None:
+            self.buffer.append(t)
+        self.offset += end - start
+        return True
+
     # поток лексем
+    # в компактном режиме -- поток видов лексем (см. TokenRecords.stream)
     @property
     def token_stream(self) -> List[str]:
+        if self.compact:
+            return list(self.records.stream())
         return self._stream
 
-    # позиции лексем из потока
+    # смещения начал лексем из потока
+    # в компактном режиме -- смещения хранимых записей (см. TokenRecords.drop)
     @property
-    def token_pos(self) -> List[FilePos]:
-        return self._token_pos
+    def token_offsets(self) -> array:
+        if self.compact:
+            return self.records.starts
+        return self._token_offsets
 
-    # позиция символа, на котором завершился разбор
+    # смещение символа, на котором завершился разбор
     # EOF в случае успешного разбора
     # символ не из алфавита в случае неуспешного разбора
     @property
-    def last_char_pos(self) -> FilePos:
-        return (self.line, self.column)
+    def last_char_offset(self) -> int:
+        return self.offset
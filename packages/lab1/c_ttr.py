@@ -1,4 +1,5 @@
 from ..automata import AutomatonActionDispatcher
+from .tokens import TokenRecords
 from typing import List, Dict, Set, Optional, Callable, Any
 
 
@@ -20,7 +21,20 @@ class TTRDispatcher(AutomatonActionDispatcher):
         # флаг разбора неключевого слова
         self.nkw: bool = False
 
-    def __init__(self):
+    # records -- записи о лексемах для разбора потока видов лексем
+    # (c_ttr_tok.xml): текст неключевых слов берется из записей
+    def __init__(self, records: Optional[TokenRecords] = None):
+        self.records = records
+        # словарь связанных методов
+        self.actions_map: Dict[str, TTRDispatcher.Inner] = {
+            'advance': self.advance,
+            'add_char': self.add_char,
+            'check_id': self.check_id,
+            'nkw_set': self.nkw_set,
+            'nkw_err': self.nkw_err,
+            'ident': self.ident,
+            'dim': self.dim
+        }
         self.reset()
 
     # продвинуть счетчик лексем на 1
@@ -63,15 +77,21 @@ class TTRDispatcher(AutomatonActionDispatcher):
         self.nkw = False
         return False
 
+    # неключевое слово целиком (поток видов лексем)
+    # то же, что nkw_set и add_char для всех символов слова
+    def ident(self, s: str, t: str) -> bool:
+        self.buffer.append(self.records.text(self.tok_counter))
+        return self.nkw_set(s, t)
+
+    # размерность целиком (поток видов лексем)
+    # в буфер, как и при посимвольном разборе, попадает
+    # только первая цифра размерности
+    def dim(self, s: str, t: str) -> bool:
+        self.buffer.append(self.records.text(self.tok_counter)[0])
+        return self.nkw_set(s, t)
+
     def __call__(self, s: str, t: str, A: str) -> bool:
-        actions_map: Dict[str, TTRDispatcher.Inner] = {
-            'advance': self.advance,
-            'add_char': self.add_char,
-            'check_id': self.check_id,
-            'nkw_set': self.nkw_set,
-            'nkw_err': self.nkw_err
-        }
-        return actions_map[A](s, t)
+        return self.actions_map[A](s, t)
 
     # номер лексемы, которая вызвала ошибку
     @property
@@ -0,0 +1,135 @@
+import os
+from bisect import bisect_left
+from typing import Optional, Tuple
+from ..automata import Automaton
+from ..automata.lines import LineIndex, shift
+from .c_stt import STTDispatcher
+from .tokens import TokenRecords
+
+# повторный разбор лексером lab1 (c_stt.xml) редактируемого текста
+# после правки разбор начинается с границы последней лексемы перед правкой
+# и продолжается, пока не встретится лексема, начинающаяся там же, где
+# начиналась одна из прежних лексем после правки: с этого места лексер
+# находится в том же состоянии над тем же текстом, поэтому дальнейшие
+# лексемы совпадают с прежними, сдвинутыми на изменение длины текста;
+# время правки зависит от размера изменившейся части,
+# сдвиг остальных записей выполняется целыми массивами
+# (см. automata.lines.shift)
+# записи хранят только смещения, строки и столбцы вычисляются
+# индексом строк текста, который правится вместе с текстом
+# записи о лексемах совпадают с записями STTDispatcher в компактном
+# режиме после разбора всего текста заново
+
+STT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c_stt.xml')
+
+# начальный размер части текста, подаваемой лексеру при повторном разборе
+# (каждая следующая часть вдвое больше)
+WINDOW = 64
+
+FilePos = Tuple[int, int]
+
+
+class IncrementalLexer:
+    def __init__(self, text: str):
+        self.dispatcher = STTDispatcher(compact=True)
+        self.automaton = Automaton(STT, self.dispatcher)
+        self.text = text
+        # индекс строк текста
+        self.lines = LineIndex(text)
+        # записи о лексемах текста
+        self.records = TokenRecords(text)
+        # смещение первого символа не из алфавита лексера
+        # (None, если текст разобран без ошибок);
+        # лексемы после него не строятся
+        self.error: Optional[int] = None
+        self.__relex(0, 0, 0, 0, 0)
+
+    # позиция (строка, столбец) первого символа не из алфавита лексера
+    @property
+    def error_pos(self) -> Optional[FilePos]:
+        return None if self.error is None else self.lines.pos(self.error)
+
+    # позиция (строка, столбец) лексемы с номером i
+    def pos(self, i: int) -> FilePos:
+        return self.lines.pos(self.records.start(i))
+
+    # заменить deleted символов текста с позиции offset на inserted
+    # и разобрать измененную часть текста заново
+    # возвращает (start, old_end, new_end): прежние лексемы
+    # с номерами от start до old_end заменены лексемами с номерами
+    # от start до new_end, остальные лексемы не изменились
+    # (лексемы после new_end только сдвинуты)
+    def edit(self, offset: int, deleted: int, inserted: str) -> Tuple[int, int, int]:
+        if not 0 <= offset <= offset + deleted <= len(self.text):
+            raise ValueError(f'Invalid edit: {offset}, {deleted}')
+        self.text = self.text[:offset] + inserted + self.text[offset + deleted:]
+        self.lines.edit(offset, deleted, inserted)
+        records = self.records
+        records.source = self.text
+        # лексер останавливается на первом символе не из алфавита:
+        # правка после него не меняет ни лексем, ни ошибки
+        if self.error is not None and self.error < offset:
+            return len(records), len(records), len(records)
+        # первая лексема, которая заканчивается не раньше начала правки
+        # (слово, заканчивающееся в начале правки, может слиться
+        # со вставленным текстом)
+        start = bisect_left(records.starts, offset)
+        if start and records.starts[start - 1] + records.lengths[start - 1] >= offset:
+            start -= 1
+        # разбор начинается с конца предыдущей лексемы
+        begin = records.starts[start - 1] + records.lengths[start - 1] if start else 0
+        return self.__relex(start, begin, offset, deleted, len(inserted))
+
+    # разобрать текст заново с позиции begin (граница перед лексемой
+    # с номером start) после правки: deleted символов с позиции offset
+    # заменены inserted символами
+    def __relex(self, start: int, begin: int, offset: int,
+                deleted: int, inserted: int) -> Tuple[int, int, int]:
+        records = self.records
+        count = len(records)
+        delta = inserted - deleted
+        D = self.dispatcher
+        P = self.automaton.parser()
+        D.bind(self.text)
+        # в строке смещения считаются в символах
+        D.width = len
+        D.offset = begin
+        new = D.records
+        # номера новой и прежней лексем, начиная с которых
+        # лексемы совпадают (None -- не совпали до конца разбора)
+        sync: Optional[Tuple[int, int]] = None
+        checked = 0
+        i = begin
+        window = WINDOW
+        lexed = True
+        while lexed and sync is None and i < len(self.text):
+            lexed = P.feed(self.text[i:i + window])
+            i += window
+            window *= 2
+            for k in range(checked, len(new)):
+                s = new.starts[k]
+                # лексема начинается в неизмененном тексте после правки
+                if s < offset + inserted:
+                    continue
+                j = bisect_left(records.starts, s - delta, start, count)
+                if j < count and records.starts[j] == s - delta:
+                    sync = k, j
+                    break
+            checked = len(new)
+        if sync is None:
+            # лексемы после правки разобраны до конца текста либо до ошибки
+            if lexed:
+                P.finish()
+            self.error = None if lexed else D.last_char_offset
+            k, old_end = len(new), count
+        else:
+            k, old_end = sync
+            # лексемы после совпавшей и ошибка сдвигаются
+            # на изменение длины текста
+            if delta:
+                shift(records.starts, old_end, delta)
+                if self.error is not None:
+                    self.error += delta
+        for column in ('kinds', 'starts', 'lengths'):
+            getattr(records, column)[start:old_end] = getattr(new, column)[:k]
+        return start, old_end, start + k
@@ -0,0 +1,115 @@
+import os
+from typing import Any, Iterable, Optional, Tuple
+from ..automata import Automaton
+from ..automata.lines import LineIndex
+from ..automata.source import byte_view, is_buffer
+from .c_stt import STTDispatcher
+from .c_ttr import TTRDispatcher
+
+# потоковая проверка программы lab1
+# лексер (c_stt.xml, компактный режим) и синтаксический анализатор
+# (c_ttr_tok.xml) работают вместе: после каждой части входа новые
+# лексемы сразу подаются анализатору, а обработанные записи отбрасываются,
+# так что память зависит от размера части, а не от размера файла
+# результат совпадает с результатом последовательного разбора:
+# ошибка лексера важнее ошибки анализатора, поэтому после ошибки
+# анализатора лексемы больше не строятся, а остаток входа только
+# проверяется на символы не из алфавита лексера
+# лексер запоминает только смещения лексем, а строки и столбцы
+# вычисляются индексом переводов строк, который пополняется каждой
+# частью входа (см. LineIndex.feed)
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+STT = os.path.join(DIRECTORY, 'c_stt.xml')
+TTR = os.path.join(DIRECTORY, 'c_ttr_tok.xml')
+
+FilePos = Tuple[int, int]
+
+
+# результат проверки: CORRECT, INCORRECT строка:столбец
+# или DUPLICATE идентификатор строка:столбец
+# (строка результата для ошибки в позиции pos)
+def incorrect(pos: FilePos) -> str:
+    return f'INCORRECT {pos[0]}:{pos[1]}'
+
+
+# смещение первого символа не из алфавита лексера lexer в частях chunks
+# части добавляются в индекс lines, смещение первой части -- lines.size
+# None, если таких символов нет
+# лексер c_stt.xml имеет одно состояние с петлями по всему алфавиту,
+# поэтому символы проверяются шаблоном серии этой петли
+# (см. CompiledTable.bare_skips)
+def _first_bad_char(lexer: Automaton, chunks: Iterable[Any],
+                    lines: LineIndex) -> Optional[int]:
+    table = lexer.table
+    skip = table.bare_skips[table.start]
+    for chunk in chunks:
+        offset = lines.size
+        buffer = is_buffer(chunk)
+        if buffer:
+            chunk = byte_view(chunk)
+        lines.feed(chunk)
+        # байтовый шаблон содержит только символы ASCII:
+        # любой другой символ не входит в алфавит,
+        # поэтому смещение в байтах равно смещению в символах
+        end = skip[1](chunk, 0).end() if buffer else skip[0](chunk, 0).end()
+        if end < len(chunk):
+            return offset + end
+    return None
+
+
+# проверить программу, поданную частями chunks (строки либо
+# побайтовые источники в UTF-8)
+# возвращает результат проверки (см. incorrect)
+def check(chunks: Iterable[Any]) -> str:
+    STTD = STTDispatcher(compact=True)
+    lexer = Automaton(STT, STTD)
+    L = lexer.parser()
+    records = STTD.records
+    TTRD = TTRDispatcher(records)
+    T = Automaton(TTR, TTRD).parser()
+    lines = LineIndex()
+    chunks = iter(chunks)
+    # число лексем, поданных анализатору
+    fed = 0
+    for chunk in chunks:
+        lines.feed(chunk)
+        if not L.feed(chunk):
+            return incorrect(lines.pos(STTD.last_char_offset))
+        end = len(records)
+        if not T.feed(records.stream(fed)):
+            break
+        fed = end
+        # ошибка может указывать не более чем на одну лексему назад
+        # (см. TTRDispatcher.err_tok)
+        records.drop(TTRD.tok_counter - 1)
+    else:
+        if not L.finish():
+            return incorrect(lines.pos(STTD.last_char_offset))
+        if T.feed(records.stream(fed)) and T.finish():
+            return 'CORRECT'
+        # ошибка анализатора после завершения лексера
+        return _error(STTD, TTRD, lines)
+    # анализатор завершился неудачей: остаток входа
+    # проверяется только на ошибки лексера
+    # незавершенный символ UTF-8 в конце поданной части -- символ
+    # не из ASCII, то есть не из алфавита лексера
+    if L.pending:
+        return incorrect(lines.pos(STTD.last_char_offset))
+    bad = _first_bad_char(lexer, chunks, lines)
+    if bad is not None:
+        return incorrect(lines.pos(bad))
+    return _error(STTD, TTRD, lines)
+
+
+# строка результата для ошибки анализатора
+# lines -- индекс строк проверенного входа
+def _error(STTD: STTDispatcher, TTRD: TTRDispatcher, lines: LineIndex) -> str:
+    records = STTD.records
+    err_tok = TTRD.err_tok
+    # ошибка в конце потока указывает на конец файла
+    offset = records.start(err_tok) if err_tok < len(records) else STTD.last_char_offset
+    err_pos = lines.pos(offset)
+    if not TTRD.duplicate:
+        return incorrect(err_pos)
+    return f'DUPLICATE {TTRD.duplicate} {err_pos[0]}:{err_pos[1]}'
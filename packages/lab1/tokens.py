@@ -0,0 +1,116 @@
+from array import array
+from typing import Any, Dict, Iterator, Optional
+from ..automata.source import source_text
+
+# компактное представление потока лексем лексера lab1
+# (см. STTDispatcher в компактном режиме)
+# лексема хранится записью из чисел в параллельных массивах:
+# номер вида лексемы, смещение начала и длина в источнике
+# (в символах для строк, в байтах для побайтовых источников);
+# строка и столбец начала вычисляются по смещению при необходимости
+# (см. automata.lines.LineIndex)
+# лексемы нумеруются от начала разбора; уже обработанные записи
+# можно отбросить (см. drop), так что при потоковой обработке
+# хранится только окно лексем
+# текст лексемы берется срезом источника; если источник лексеру
+# не сообщен (разбор строки или потока частями), тексты неключевых
+# слов сохраняются отдельно
+# синтаксический анализатор (c_ttr_tok.xml) получает поток видов лексем,
+# так что неключевое слово -- один элемент потока
+
+# ключевые слова и знаки пунктуации -- отдельные виды лексем
+KEYWORDS = ('long', 'short', 'int', 'double', 'float', 'bool', 'char')
+PUNCT = ('[', ']', ',', ';')
+# виды неключевых слов:
+# id -- начинается с буквы или знака подчеркивания,
+# num -- десятичное число без ведущих нулей,
+# nkw -- прочие неключевые слова (например, 0 или 5x)
+WORDS = ('id', 'num', 'nkw')
+KINDS = KEYWORDS + PUNCT + WORDS
+# номер вида лексемы по имени
+KIND_IDS: Dict[str, int] = {kind: i for i, kind in enumerate(KINDS)}
+
+
+# вид неключевого слова text
+def word_kind(text: str) -> str:
+    first = text[0]
+    if first == '_' or 'a' <= first <= 'z' or 'A' <= first <= 'Z':
+        return 'id'
+    if '1' <= first <= '9' and text.isascii() and text.isdigit():
+        return 'num'
+    return 'nkw'
+
+
+# вид лексемы text (ключевого слова или неключевого слова)
+def kind_of(text: str) -> int:
+    kind = KIND_IDS.get(text)
+    if kind is None or kind >= len(KEYWORDS):
+        kind = KIND_IDS[word_kind(text)]
+    return kind
+
+
+class TokenRecords:
+    def __init__(self, source: Any = None):
+        # номера видов лексем
+        self.kinds = array('B')
+        # смещения начал лексем
+        self.starts = array('q')
+        # длины лексем
+        self.lengths = array('I')
+        # номер первой хранимой лексемы (число отброшенных записей)
+        self.base = 0
+        # разбираемый источник (None, если не сообщен лексеру)
+        self.source = source
+        # тексты неключевых слов по номерам лексем
+        # (только если источник не сообщен)
+        self.spellings: Dict[int, str] = dict()
+
+    # добавить лексему вида kind, занимающую length позиций с позиции start
+    # text -- текст неключевого слова, если источник не сообщен
+    def append(self, kind: int, start: int, length: int,
+               text: Optional[str] = None) -> None:
+        if text is not None:
+            self.spellings[len(self)] = text
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    # число лексем от начала разбора (включая отброшенные)
+    def __len__(self) -> int:
+        return self.base + len(self.kinds)
+
+    # вид лексемы с номером i
+    def kind(self, i: int) -> str:
+        return KINDS[self.kinds[i - self.base]]
+
+    # текст лексемы с номером i
+    def text(self, i: int) -> str:
+        kind = self.kinds[i - self.base]
+        if kind < len(KEYWORDS) + len(PUNCT):
+            return KINDS[kind]
+        spelling = self.spellings.get(i)
+        if spelling is not None:
+            return spelling
+        start = self.starts[i - self.base]
+        return source_text(self.source, start, start + self.lengths[i - self.base])
+
+    # смещение начала лексемы с номером i
+    def start(self, i: int) -> int:
+        return self.starts[i - self.base]
+
+    # поток видов лексем с номерами от start
+    # для синтаксического анализатора
+    def stream(self, start: int = 0) -> Iterator[str]:
+        kinds = self.kinds[start - self.base:] if start > self.base else self.kinds
+        return map(KINDS.__getitem__, kinds)
+
+    # отбросить записи лексем с номерами меньше upto
+    def drop(self, upto: int) -> None:
+        k = upto - self.base
+        if k <= 0:
+            return
+        for column in (self.kinds, self.starts, self.lengths):
+            del column[:k]
+        if self.spellings:
+            self.spellings = {i: text for i, text in self.spellings.items() if i >= upto}
+        self.base = upto
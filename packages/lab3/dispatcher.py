@@ -1,6 +1,6 @@
 from __future__ import annotations
 from ..ll import LLActionDispatcher
-from typing import Dict, Tuple, List, Set
+from typing import Callable, Dict, Tuple, List, Set
 
 
 class NSTreeElement:
@@ -24,6 +24,26 @@ class NSTreeElement:
 
 class Dispatcher(LLActionDispatcher):
     def __init__(self):
+        # словарь связанных методов
+        self.actions_map: Dict[str, Callable[[str], bool]] = {
+            'count': self.count,
+            'add_char': self.add_char,
+            'set_current_ns': self.set_current_ns,
+            'goto_parent': self.goto_parent,
+            'register_prim': self.register_prim,
+            'register_size': self.register_size,
+            'register_sign': self.register_sign,
+            'register_type': self.register_type,
+            'create_foo': self.create_foo,
+            'make_impl': self.make_impl,
+            'make_prot': self.make_prot,
+            'commit_foo': self.commit_foo,
+            'create_param': self.create_param,
+            'register_ellipsis': self.register_ellipsis,
+            'add_dim': self.add_dim,
+            'append_arr_spec': self.append_arr_spec,
+            'set_nkw': self.set_nkw
+        }
         self.reset()
 
     def reset(self):
@@ -211,24 +231,7 @@ class Dispatcher(LLActionDispatcher):
         return True
 
     def __call__(self, A: str, t: str) -> bool:
-        action_map = {'count' : self.count,
-                      'add_char': self.add_char,
-                      'set_current_ns': self.set_current_ns,
-                      'goto_parent': self.goto_parent,
-                      'register_prim': self.register_prim,
-                      'register_size': self.register_size,
-                      'register_sign': self.register_sign,
-                      'register_type': self.register_type,
-                      'create_foo': self.create_foo,
-                      'make_impl': self.make_impl,
-                      'make_prot': self.make_prot,
-                      'commit_foo': self.commit_foo,
-                      'create_param': self.create_param,
-                      'register_ellipsis': self.register_ellipsis,
-                      'add_dim': self.add_dim,
-                      'append_arr_spec': self.append_arr_spec,
-                      'set_nkw': self.set_nkw}
-        return action_map[A](t)
+        return self.actions_map[A](t)
     
     @property
     def err_tok(self):
@@ -1,63 +1,102 @@
 from ..lr import LRActionDispatcher
-from typing import List, Dict, Tuple
+from ..automata.source import char_width, source_text
+from array import array
+from bisect import bisect_right
+from typing import List, Dict, Callable, Any
 
 
 class Dispatcher(LRActionDispatcher):
     keywords = ['long', 'short', 'int', 'double',
                 'float', 'bool', 'char', 'namespace',
                 'signed', 'unsigned', 'void']
-    FilePos = Tuple[int, int]
     def reset(self):
         # поток лексем
         self.stream: List[str] = []
         # буфер символов
         self.buffer: List[str] = []
-        # текущая строка и столбец
-        self.line: int = 1
-        self.column: int = 1
-        # положение разбираемой лексемы
-        self.current_token_pos: Dispatcher.FilePos = (self.line, self.column)
-        # список положений лексем из потока
-        self.token_pos: List[Dispatcher.FilePos] = []
+        # смещения начал лексем и номера их первых элементов в потоке
+        # (неключевое слово занимает в потоке несколько элементов,
+        # см. stream_offset; строки и столбцы вычисляются по смещениям
+        # при необходимости, см. automata.lines.LineIndex)
+        self.token_offsets = array('q')
+        self.token_indices = array('q')
+        # разбираемый источник (см. bind)
+        # если задан, текст лексем берется его срезами,
+        # а символы в буфер не накапливаются
+        self.source: Any = None
+        # смещение текущего символа в источнике
+        # и функция вычисления ширины символа
+        self.offset: int = 0
+        self.width: Callable[[str], int] = len
+        # смещение начала разбираемой лексемы (-1 -- лексемы нет)
+        self.token_start: int = -1
+
+    def bind(self, source: Any):
+        self.source = source
+        # смещения в побайтовом источнике считаются в байтах
+        self.width = char_width
 
     def __init__(self):
+        # словарь связанных методов
+        self.actions_map: Dict[str, Callable[[str], bool]] = {
+            'add_char': self.add_char,
+            'append': self.append,
+            'delim_char': self.delim_char,
+            'add_ellipsis': self.add_ellipsis
+        }
         self.reset()
 
     def __call__(self, A: str, t: str) -> bool:
-        actions_map = {'add_char': self.add_char,
-                       'append': self.append,
-                       'delim_char': self.delim_char,
-                       'add_ellipsis': self.add_ellipsis}
-        return actions_map[A](t)
+        return self.actions_map[A](t)
 
-    # изменить текущие строку и столбец по символу
+    # продвинуть смещение на символ
     def _advance_char(self, t: str):
-        if t == '\n':
-            self.line += 1
-            self.column = 1
+        self.offset += 1 if t < '\x80' else self.width(t)
+
+    # текст разбираемой лексемы
+    # (срез источника либо содержимое буфера)
+    def _token_text(self) -> str:
+        if self.source is None:
+            text = ''.join(self.buffer)
+            self.buffer.clear()
         else:
-            self.column += 1
+            text = source_text(self.source, self.token_start, self.offset)
+        self.token_start = -1
+        return text
+
+    # запомнить смещение start лексемы, которая начинается
+    # со следующего элемента потока
+    def _add_token(self, start: int):
+        self.token_offsets.append(start)
+        self.token_indices.append(len(self.stream))
+
+    # смещение элемента потока с номером i
+    # (для номера за концом потока -- смещение символа,
+    # на котором разбор остановился)
+    # символы неключевого слова следуют за спецлексемой nkw
+    # и занимают по одной позиции (символы из ASCII)
+    def stream_offset(self, i: int) -> int:
+        if i >= len(self.stream):
+            return self.offset
+        j = bisect_right(self.token_indices, i) - 1
+        return self.token_offsets[j] + max(0, i - self.token_indices[j] - 1)
 
     # добавить лексему в поток
     def _append_to_stream(self):
-        # если буфер не пуст
-        if self.buffer:
+        # если лексема начата
+        if self.token_start >= 0:
+            start = self.token_start
             # собрать лексему в строку
-            str = ''.join(self.buffer)
-            # добавить положение лексемы в список положений
-            self.token_pos.append(self.current_token_pos)
+            str = self._token_text()
+            # добавить смещение лексемы в список смещений
+            self._add_token(start)
             # если в буфере ключевое слово, добавить его как есть
             if str in Dispatcher.keywords:
                 self.stream.append(str)
             # иначе добавить спецлексему, а затем добавить лексему посимвольно
             else:
                 self.stream.append('nkw')
-                ln, cl = self.current_token_pos
-                for c in self.buffer:
-                    self.stream.append(c)
-                    self.token_pos.append((ln, cl))
-                    cl += 1
-            self.buffer.clear()
+                self.stream += str
 
     # при встрече разделяющего символа
     def delim_char(self, t: str) -> bool:
@@ -69,29 +108,30 @@ class Dispatcher(LRActionDispatcher):
     def append(self, t: str) -> bool:
         self._append_to_stream()
         # добавить знак пунктуации
-        self.token_pos.append((self.line, self.column))
+        self._add_token(self.offset)
         self.stream.append(t)
         self._advance_char(t)
         return True
 
     # добавить символ в буфер
     def add_char(self, t: str) -> bool:
-        # если буфер пуст, установить положение текущего символа как положение лексемы
-        if not self.buffer:
-            self.current_token_pos = (self.line, self.column)
-        self.buffer.append(t)
+        # если лексема только начинается, установить положение текущего символа как положение лексемы
+        if self.token_start < 0:
+            self.token_start = self.offset
+        if self.source is None:
+            self.buffer.append(t)
         self._advance_char(t)
         return True
 
     # добавить многоточие как одну лексему
     def add_ellipsis(self, t: str) -> bool:
         # начало многоточия на два символа отстаёт от его конца
-        self.token_pos.append((self.line, self.column-2))
+        self._add_token(self.offset - 2)
         self.stream.append('...')
-        self.column += 1
+        self.offset += 1
         return True
 
-    # позиция символа, на котором разбор остановился
+    # смещение символа, на котором разбор остановился
     @property
-    def last_char_pos(self):
-        return (self.line, self.column)
+    def last_char_offset(self) -> int:
+        return self.offset
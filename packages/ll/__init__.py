@@ -1,2 +1,3 @@
 from .gram import GrammarParser, GrammarParserException
-from .dispatcher_iface import LLActionDispatcher
\ No newline at end of file
+from .dispatcher_iface import LLActionDispatcher
+from .codegen import GeneratedParser, NestingError
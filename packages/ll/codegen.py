@@ -0,0 +1,402 @@
+import hashlib
+import os
+import sys
+from itertools import chain
+from typing import Any, Dict, FrozenSet, List, Set
+from ..automata.codegen import import_file, save_module
+from ..automata.source import is_buffer, iter_chars
+from .dispatcher_iface import LLActionDispatcher
+from .gram import GrammarParser, NilAction
+
+# генерация модуля Python с анализатором рекурсивного спуска
+# по правилам и таблице GrammarParser
+# каждому нетерминалу соответствует функция, которая выбирает
+# альтернативу по классу текущей лексемы (классы и множества
+# направляющих символов -- из CompiledTable) и разбирает ее правую часть;
+# действия вызываются через заранее связанные методы диспетчера
+# порядок вызовов действий совпадает с GrammarParser.parse:
+# действия, которые таблица откладывает до снятия кадра со стека
+# (левой части, пустой строки, нетерминала), выполняются функцией
+# в обратном порядке после разбора правой части, а действие
+# нетерминала, вызванного не в конце правила, -- после возврата из него
+# нетерминал в конце правила не увеличивает глубину рекурсии:
+# функция возвращает пару (функция нетерминала, кадр), и вызов выполняет
+# цикл call; кадр -- список действий, отложенных предшествующими
+# функциями цепочки, выполняется в конце цепочки
+# нетерминал той же функции в конце правила разбирается повторением
+# цикла функции, а небольшие нетерминалы встраиваются в вызывающую
+# функцию, так что, например, разбор последовательности символов
+# (LEX -: ... LEXMORE, LEXMORE -: LEX | $) выполняется одним циклом
+# нетерминалы не в конце правил вызываются рекурсивно; глубина
+# рекурсивных вызовов (вложенность конструкций входа) считается
+# явно и не может превысить MAX_DEPTH, иначе разбор прерывается
+# исключением NestingError модуля до переполнения стека Python;
+# вход с произвольной вложенностью разбирается по таблице
+# (GrammarParser.parse), у которой стек явный
+# сгенерированный модуль содержит:
+# KEY -- ключ грамматики (см. grammar_key)
+# MAX_DEPTH, NestingError -- предел глубины и исключение при его превышении
+# make(dispatcher) -- функция parse(tokens) для диспетчера,
+# tokens -- поток лексем, заканчивающийся лексемой ''
+
+# суффикс имени модуля, сохраняемого рядом с грамматикой
+SUFFIX = '_rd'
+# версия генератора: модули, сгенерированные другой версией,
+# генерируются заново
+VERSION = 2
+# наибольшее число элементов правых частей нетерминала,
+# разбор которого встраивается в вызывающую функцию
+INLINE = 12
+# наибольшая глубина рекурсивных вызовов функций нетерминалов
+# (каждый вызов занимает не больше двух кадров стека Python)
+MAX_DEPTH = 200
+
+
+# вложенность входа превышает предел глубины сгенерированного анализатора
+class NestingError(Exception):
+    pass
+
+
+# ключ текста грамматики data (байты): модуль, сгенерированный
+# по грамматике с тем же ключом, можно использовать повторно
+def grammar_key(data: bytes) -> str:
+    return hashlib.sha1(b'%d\n' % VERSION + data).hexdigest()
+
+
+# генератор исходного текста модуля для анализатора parser
+class _Generator:
+    def __init__(self, parser: GrammarParser):
+        self.parser = parser
+        self.table = parser.table
+        self.compiled = parser.compiled
+        # первое правило для каждого нетерминала слева
+        # (переход к нетерминалу выполняется на его левую часть)
+        self.first_rule = dict()
+        for r in parser.rules:
+            self.first_rule.setdefault(r.left, r)
+        self.names = {X: f'n{i}' for i, X in enumerate(self.first_rule)}
+        # нетерминалы, вызываемые в конце правил (функции получают кадр)
+        self.tail = set()
+        # нетерминалы с правилами, заканчивающимися нетерминалом
+        # (функции могут вернуть пару для call)
+        self.chained = set()
+        for r in parser.rules:
+            if r.right and r.right[-1] in parser.nt:
+                self.tail.add(r.right[-1])
+                self.chained.add(r.left)
+        # правила по строкам левых частей
+        self.rules = {r.nleft: r for r in parser.rules}
+        # нетерминалы, достижимые из каждого нетерминала через правые части
+        self.reach = self.reachable()
+        # множества классов, используемые в условиях
+        self.sets: Dict[FrozenSet[int], str] = dict()
+        # есть ли в функции повторение разбора и счет глубины (см. function)
+        self.looped = False
+        self.counted = False
+
+    def reachable(self) -> Dict[str, Set[str]]:
+        edges: Dict[str, Set[str]] = {X: set() for X in self.first_rule}
+        for r in self.parser.rules:
+            edges[r.left].update(Y for Y in r.right if Y in self.parser.nt)
+        reach = dict()
+        for X in edges:
+            seen = set()
+            work = [X]
+            while work:
+                for Y in edges[work.pop()]:
+                    if Y not in seen:
+                        seen.add(Y)
+                        work.append(Y)
+            reach[X] = seen
+        return reach
+
+    # условие на класс c для строки таблицы row (None -- условие ложно)
+    # negate -- условие того, что класс не входит в множество строки
+    def condition(self, row, negate: bool = False) -> Any:
+        cs = frozenset(self.compiled.classes[a] for a in row.terminals)
+        if not cs:
+            return None
+        if len(cs) == 1:
+            return f'c {"!=" if negate else "=="} {next(iter(cs))}'
+        if cs not in self.sets:
+            self.sets[cs] = f'D{len(self.sets)}'
+        return f'c {"not in" if negate else "in"} {self.sets[cs]}'
+
+    # имя функции действия строки row (None -- действия нет)
+    def action(self, row) -> Any:
+        A = row.action
+        if not A:
+            return None
+        return f'a{self.compiled.action_names.index(A)}'
+
+    # вызов функции нетерминала X не в конце правила
+    def call(self, X: str) -> str:
+        f = self.names[X]
+        if X in self.chained:
+            return f'call({f})'
+        return f'{f}(None)' if X in self.tail else f'{f}()'
+
+    # строки выполнения отложенных действий deferred и кадра и возврата
+    # framed -- может ли кадр быть непустым (иначе frame -- None
+    # либо функция кадра не получает)
+    def pop(self, framed: bool, deferred: List[str]) -> List[str]:
+        lines = []
+        for a in reversed(deferred):
+            lines += [f'if not {a}(token):', f'    return False']
+        if framed:
+            lines += ['if frame:',
+                      '    for a in reversed(frame):',
+                      '        if not a(token):',
+                      '            return False']
+        return lines + ['return True']
+
+    # можно ли встроить разбор нетерминала Y в функцию другого нетерминала
+    # на месте вызова в конце правила
+    def inlinable(self, Y: str) -> bool:
+        size = sum(len(r.right) for r in self.parser.rules if r.left == Y)
+        return size <= INLINE
+
+    # тело альтернативы: правая часть правила r в функции нетерминала X
+    # inlined -- правило встроенного нетерминала (см. inlinable)
+    def body(self, X: str, r, inlined: bool) -> List[str]:
+        table = self.table
+        framed = X in self.tail or inlined
+        lines = []
+        deferred = []
+        A = self.action(table[r.nleft])
+        if A:
+            deferred.append(A)
+        for k, tk in enumerate(r.right):
+            row = table[r.nright + k]
+            last = k == len(r.right) - 1
+            A = self.action(row)
+            # множество первой строки совпадает с множеством альтернативы
+            if k:
+                cond = self.condition(row, True)
+                if cond is None:
+                    return lines + ['return False']
+                lines += [f'if {cond}:', f'    return False']
+            if row.accept:
+                if A:
+                    lines += [f'if not {A}(token):', f'    return False']
+                lines += ['token = next(it)', 'c = get(token, 0)']
+                if last:
+                    lines += self.pop(framed, deferred)
+            elif tk not in self.parser.nt:
+                # пустая строка
+                if not last:
+                    if A:
+                        deferred.append(A)
+                    continue
+                if A:
+                    lines += [f'if not {A}(token):', f'    return False']
+                lines += self.pop(framed, deferred)
+            elif row.stack and r.left in self.reach[tk]:
+                # рекурсивный вызов: глубина считается
+                self.counted = True
+                lines += ['depth += 1',
+                          'if depth > MAX_DEPTH:',
+                          '    raise NestingError(MAX_DEPTH)',
+                          f'if not {self.call(tk)}:',
+                          f'    return False',
+                          'depth -= 1']
+                if A:
+                    lines += [f'if not {A}(token):', f'    return False']
+            elif row.stack:
+                lines += [f'if not {self.call(tk)}:', f'    return False']
+                if A:
+                    lines += [f'if not {A}(token):', f'    return False']
+            else:
+                # нетерминал в конце правила: отложенные действия
+                # добавляются в кадр
+                if A:
+                    deferred.append(A)
+                items = ', '.join(deferred)
+                if deferred and framed:
+                    lines += ['if frame is None:',
+                              f'    frame = [{items}]',
+                              'else:',
+                              f'    frame += [{items}]']
+                elif deferred:
+                    lines += [f'frame = [{items}]']
+                if tk == X:
+                    # повторение разбора в цикле функции
+                    self.looped = True
+                    lines += ['continue']
+                elif not inlined and self.inlinable(tk):
+                    lines += [f'# {tk}'] + self.alternatives(X, tk, True)
+                else:
+                    lines += [f'return {self.names[tk]}, frame']
+        return lines
+
+    # выбор альтернативы нетерминала Y и разбор ее
+    # в функции нетерминала X
+    def alternatives(self, X: str, Y: str, inlined: bool) -> List[str]:
+        table = self.table
+        lines = []
+        # альтернативы выбираются перебором строк левых частей
+        # до строки с признаком error (первая подходящая строка)
+        k = self.first_rule[Y].nleft
+        keyword = 'if'
+        while True:
+            cond = self.condition(table[k])
+            if cond is not None:
+                lines.append(f'{keyword} {cond}:')
+                keyword = 'elif'
+                lines += ['    ' + line for line in self.body(X, self.rules[k], inlined)]
+            if table[k].error:
+                break
+            k += 1
+        return lines + ['return False']
+
+    # функция нетерминала X
+    def function(self, X: str) -> List[str]:
+        # кадр получают функции, вызываемые в конце правил,
+        # и функции, вызываемые через call
+        param = 'frame' if X in self.tail or X in self.chained else ''
+        self.looped = False
+        self.counted = False
+        body = self.alternatives(X, X, False)
+        names = 'token, c, depth' if self.counted else 'token, c'
+        lines = [f'# {X}', f'def {self.names[X]}({param}):',
+                 f'    nonlocal {names}']
+        if self.looped:
+            return lines + ['    while True:'] + ['        ' + line for line in body]
+        return lines + ['    ' + line for line in body]
+
+    def generate(self, key: str) -> str:
+        functions = []
+        for X in self.first_rule:
+            functions += ['        ' + line for line in self.function(X)] + ['']
+        start = self.call(self.parser.rules[0].left)
+        names = self.compiled.action_names
+        lines = ['# модуль сгенерирован packages/ll/codegen.py',
+                 '# по грамматике; не редактировать',
+                 '',
+                 f'KEY = {key!r}',
+                 f'MAX_DEPTH = {MAX_DEPTH}',
+                 f'ACTIONS = {names!r}',
+                 '# лексема -> номер класса',
+                 f'CLASSES = {self.compiled.classes!r}',
+                 '# множества классов направляющих символов']
+        for cs, name in self.sets.items():
+            lines.append(f'{name} = frozenset({sorted(cs)!r})')
+        lines += ['',
+                  '',
+                  '# вложенность входа больше MAX_DEPTH',
+                  'class NestingError(Exception):',
+                  '    pass',
+                  '',
+                  '',
+                  '# вызов функции нетерминала f с продолжением цепочки',
+                  '# нетерминалов в конце правил',
+                  'def call(f):',
+                  '    r = f(None)',
+                  '    while r and r is not True:',
+                  '        f, frame = r',
+                  '        r = f(frame)',
+                  '    return r',
+                  '',
+                  '',
+                  '# действие A диспетчера dispatcher в виде функции (token)',
+                  '# связанный метод берется из словаря actions_map диспетчера,',
+                  '# если он есть, иначе вызывается сам диспетчер',
+                  'def bind(dispatcher, A):',
+                  "    method = getattr(dispatcher, 'actions_map', {}).get(A)",
+                  '    if method is not None:',
+                  '        return method',
+                  '    return lambda t: dispatcher(A, t)',
+                  '',
+                  '',
+                  'def make(dispatcher):']
+        for A in range(1, len(names)):
+            lines.append(f'    a{A} = bind(dispatcher, {names[A]!r})')
+        lines += ['',
+                  '    def parse(tokens):',
+                  '        get = CLASSES.get',
+                  '        it = iter(tokens)',
+                  '        token = next(it)',
+                  '        c = get(token, 0)',
+                  '        depth = 0',
+                  '']
+        lines += functions
+        lines += [f'        return {start} and not token',
+                  '',
+                  '    return parse']
+        return '\n'.join(lines) + '\n'
+
+
+# исходный текст модуля для анализатора parser
+# key -- ключ текста грамматики
+def generate(parser: GrammarParser, key: str) -> str:
+    return _Generator(parser).generate(key)
+
+
+# модуль для грамматики из файла filename
+# модуль кэшируется рядом с грамматикой (<имя грамматики>_rd.py)
+# и генерируется заново, если грамматика изменилась; грамматика
+# анализируется только при генерации
+# если записать файл нельзя, модуль создается в памяти
+def load(filename: str) -> Any:
+    with open(filename, 'rb') as fp:
+        key = grammar_key(fp.read())
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    path = os.path.join(os.path.dirname(os.path.abspath(filename)), stem + SUFFIX + '.py')
+    name = f'{stem}{SUFFIX}_{key[:12]}'
+    try:
+        module = import_file(name, path)
+        if getattr(module, 'KEY', None) == key:
+            return module
+    except (OSError, SyntaxError):
+        pass
+    return save_module(name, generate(GrammarParser(filename), key), path)
+
+
+# анализатор рекурсивного спуска для грамматики из файла filename
+# результаты и вызовы диспетчера совпадают с GrammarParser.parse
+# для входа с вложенностью не больше MAX_DEPTH
+class GeneratedParser:
+    def __init__(self, filename: str, disp: LLActionDispatcher=NilAction()):
+        self.filename = filename
+        self.module = load(filename)
+        self.dispatcher = disp
+
+    # при смене диспетчера действия связываются заново
+    @property
+    def dispatcher(self) -> LLActionDispatcher:
+        return self._dispatcher
+
+    @dispatcher.setter
+    def dispatcher(self, disp: LLActionDispatcher) -> None:
+        self._dispatcher = disp
+        self._parse = self.module.make(disp)
+
+    # разбор потока лексем/символов token_stream
+    # либо побайтового источника (bytes, mmap, memoryview) в UTF-8
+    # если вложенность входа превышает MAX_DEPTH, возбуждается
+    # NestingError (действия до этого места уже выполнены);
+    # такой вход разбирается GrammarParser
+    def parse(self, token_stream) -> bool:
+        dispatcher = self._dispatcher
+        dispatcher.reset()
+        if is_buffer(token_stream):
+            dispatcher.bind(token_stream)
+            token_stream = iter_chars(token_stream)
+        try:
+            return self._parse(chain(token_stream, ('',)))
+        except self.module.NestingError:
+            raise NestingError(f'Nesting deeper than {self.module.MAX_DEPTH}') from None
+
+
+# сгенерировать модуль по грамматике из командной строки:
+# python -m packages.ll.codegen грамматика.txt [модуль.py]
+if __name__ == '__main__':
+    grammar = sys.argv[1]
+    out = sys.argv[2] if len(sys.argv) > 2 else None
+    if out is None:
+        load(grammar)
+    else:
+        with open(grammar, 'rb') as fp:
+            key = grammar_key(fp.read())
+        with open(out, 'w', encoding='utf-8') as fp:
+            fp.write(generate(GrammarParser(grammar), key))
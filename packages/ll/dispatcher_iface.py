@@ -15,4 +15,10 @@ class LLActionDispatcher(metaclass=ABCMeta):
     # либо следующая лексема
     @abstractmethod
     def __call__(self, A: str, t: str) -> bool:
+        pass
+
+    # сообщить диспетчеру побайтовый источник (bytes, mmap, memoryview),
+    # который будет разобран целиком
+    # выполняется после reset; по умолчанию источник не используется
+    def bind(self, source):
         pass
\ No newline at end of file
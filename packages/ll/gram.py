@@ -1,17 +1,17 @@
 import inspect
-from copy import deepcopy
 from ..automata import Automaton
+from ..automata.source import is_buffer, iter_chars
 from .dispatcher import Rule, Dispatcher
 from .dispatcher_iface import LLActionDispatcher
+from .table import CompiledTable
+from array import array
 import pathlib
-from functools import reduce
-from operator import or_ as union
-from typing import List, Tuple, Dict, Iterator, Iterable, Set
+from typing import List, Tuple, Dict, Iterator, Iterable, Optional, Set
 
 
 # вычислить S(X) для атома X (терминала или нетерминала)
-# с учётом набора правил R и существующих множеств S
-def S_single(N, R, S, X):
+# с учётом множеств F нетерминалов из N
+def S_single(N, F, X):
     # небольшой хак для множеств терминалов
     if X and X[0] == '\1':
         SX = set(X[1:])
@@ -24,24 +24,82 @@ def S_single(N, R, S, X):
     # S(X) = X, если X - терминал
     if X not in N:
         return {X}
-    # иначе S(X) -- объединение всех S правил, где X слева
+    # иначе S(X) -- объединение S всех правил, где X слева
+    # (см. GrammarParser.first_sets)
     else:
-        return reduce(union, (s for i, s in enumerate(S)
-                              if R[i].left == X))
+        return F[X]
 
 
 # вычислить S(A) для цепочки A
-def S_chain(N, R, S, A):
-    # пустая цепочка входит в S(A), если она входит во все S(x) для x из A
-    d = {''} if all('' in S_single(N, R, S, X) for X in A) else set()
+def S_chain(N, F, A):
     ret = set()
     # перебираем элементы цепочки A и вычисляем для них S
     for X in A:
-        sX = S_single(N, R, S, X)
+        sX = S_single(N, F, X)
         ret |= sX - {''}
         if '' not in sX:
-            break
-    return ret | d
+            return ret
+    # пустая цепочка входит в S(A), если она входит во все S(x) для x из A
+    return ret | {''}
+
+
+# замыкание множеств по графу зависимостей:
+# S(n) = base[n] | объединение S(d) для всех d из deps[n]
+# вершины графа обходятся алгоритмом Тарьяна, который выдает
+# компоненты сильной связности после всех компонент, от которых они
+# зависят; у вершин одной компоненты множества совпадают, поэтому
+# каждое множество вычисляется один раз, без повторных проходов
+def closure(base: Dict[str, set], deps: Dict[str, Set[str]]) -> Dict[str, set]:
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    # стек вершин незавершенных компонент
+    stack: List[str] = []
+    onstack: Set[str] = set()
+    result: Dict[str, set] = {}
+    for root in base:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        onstack.add(root)
+        # стек обхода в глубину: вершина и итератор по ее зависимостям
+        work = [(root, iter(deps[root]))]
+        while work:
+            v, it = work[-1]
+            for w in it:
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    onstack.add(w)
+                    work.append((w, iter(deps[w])))
+                    break
+                if w in onstack:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] != index[v]:
+                    continue
+                # v -- корень компоненты: снять ее со стека
+                component = []
+                while True:
+                    w = stack.pop()
+                    onstack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                # зависимости вне компоненты уже вычислены
+                s = set()
+                for w in component:
+                    s |= base[w]
+                    for d in deps[w]:
+                        if d in result:
+                            s |= result[d]
+                for w in component:
+                    result[w] = set(s)
+    return result
 
 
 # строка таблицы разбора
@@ -60,6 +118,9 @@ class TableRow:
         # генерировать ошибку или перейти к следующей альтернативе?
         self.error = False
         # вместо return используется значение jump
+        # для первой строки левых частей нетерминала -- номера строк
+        # альтернатив по направляющим символам (см. predict_maps)
+        self.predict: Optional[Dict[str, int]] = None
 
     def __str__(self):
         s = (f"{self.terminals}\t"
@@ -103,6 +164,10 @@ class HaltIterable:
 
 
 class GrammarParser:
+    # начальный размер стеков разбора (стеки удваиваются при заполнении)
+    STACK_SIZE = 256
+    # события разбора iterparse
+    ENTER, EXIT, TERMINAL, ACTION, ERROR = range(5)
     # путь до XML-файла грамматики
     p = pathlib.Path(__file__).parent / 'grammar.xml'
     D = Dispatcher()
@@ -114,6 +179,8 @@ class GrammarParser:
         if not GrammarParser.A.parse(s):
             raise GrammarParserException('Not a grammar')
         rules = GrammarParser.D.ruleset
+        # правила грамматики (см. codegen)
+        self.rules = rules
         self.nt = GrammarParser.D.nt
         # пронумеровать правила
         self.enumerate_rules(rules)
@@ -130,6 +197,12 @@ class GrammarParser:
         self.table = self.build_table(St, Fo, Te, rules)
         # заменить None в terminals на ''
         self.denonify()
+        # отображения направляющих символов в альтернативы
+        self.predict_maps(rules)
+        # таблица в массивах для parse
+        self.compiled = CompiledTable(self.table)
+        # нетерминалы и их номера в строках левых частей (для iterparse)
+        self.symbol_rows(rules)
         # установить диспетчер действий
         self.dispatcher = disp
 
@@ -169,67 +242,101 @@ class GrammarParser:
             count += len(R[j].right)
             j += 1
 
+    # множества стартовых символов нетерминалов
+    # сначала рабочим списком находятся нетерминалы, из которых
+    # выводится пустая цепочка: у каждого правила считается число
+    # еще не обнуляемых элементов правой части, и правило
+    # пересматривается, только когда обнуляемым становится его элемент
+    # затем S(X) -- замыкание (см. closure) по графу, в котором X
+    # зависит от нетерминалов начала правых частей своих правил
+    # (до первого необнуляемого элемента включительно),
+    # а пустая цепочка входит в S(X) обнуляемых нетерминалов
+    def first_sets(self, R):
+        N = self.nt
+        nullable = set()
+        # число необнуляемых элементов правых частей правил
+        count = []
+        # правила, в правых частях которых встречается нетерминал
+        uses = {n: [] for n in N}
+        work = []
+        for i, r in enumerate(R):
+            c = 0
+            for X in r.right:
+                if X in N:
+                    uses[X].append(i)
+                    c += 1
+                # терминал (кроме пустой строки) не обнуляется
+                elif X:
+                    c = -1
+                    break
+            count.append(c)
+            if not c:
+                work.append(r.left)
+        while work:
+            X = work.pop()
+            if X in nullable:
+                continue
+            nullable.add(X)
+            for i in uses[X]:
+                count[i] -= 1
+                if not count[i]:
+                    work.append(R[i].left)
+        # пустая строка не переходит по зависимостям:
+        # она добавляется после замыкания
+        base = {n: set() for n in N}
+        deps = {n: set() for n in N}
+        for r in R:
+            for X in r.right:
+                if X in N:
+                    deps[r.left].add(X)
+                    if X not in nullable:
+                        break
+                else:
+                    sX = S_single(N, None, X)
+                    base[r.left] |= sX - {''}
+                    if '' not in sX:
+                        break
+        F = closure(base, deps)
+        for n in nullable:
+            F[n].add('')
+        return F
+
     def start_sets(self, R):
-        # изначально все множества пусты
-        S = [set() for i, _ in enumerate(R)]
-        # были ли изменения множеств
-        new = True
-        while new:
-            new = False
-            # новый набор множеств
-            curS = []
-            # для каждого множества из старого набора
-            # вычислить новое множество
-            for i, s in enumerate(S):
-                Sn = S_chain(self.nt, R, S, R[i].right)
-                # если новое множество не является подмножеством старого,
-                # значит, произошли изменения
-                if not Sn <= s:
-                    new = True
-                # добавить объединение старого и нового множества
-                curS.append(s | Sn)
-            # обновить набор множеств
-            S = curS
-        return S
+        F = self.first_sets(R)
+        return [S_chain(self.nt, F, r.right) for r in R]
 
+    # множества стартовых символов нетерминалов
+    # по множествам St стартовых символов правил
+    def left_sets(self, R, St):
+        F = {n: set() for n in self.nt}
+        for i, r in enumerate(R):
+            F[r.left] |= St[i]
+        return F
+
+    # множества последующих символов нетерминалов
+    # S(n) -- замыкание (см. closure) по графу, в котором n зависит
+    # от левой части X каждого правила вида X -: a n b,
+    # если из цепочки b выводится пустая цепочка
     def follow_sets(self, R, St):
-        # изначально все множества пусты
-        S = {n: set() for n in self.nt}
-        # кроме множества стартового нетерминала:
-        # у него есть символ конца цепочки (None)
-        S[R[0].left].add(None)
-        new = True
-        while new:
-            new = False
-            # новый набор множеств
-            curS = deepcopy(S)
-            # для каждого нетерминала N
-            for n in S:
-                # для каждого правила r
-                for r in R:
-                    # для правой части правила
-                    for i in range(len(r.right)):
-                        # если правило вида
-                        # X -: a N b
-                        # то вычислить S(b)
-                        # a, b -- подцепочки (возможно, пустые)
-                        if n == r.right[i]:
-                            chain = r.right[i+1:]
-                            
-                            s = S_chain(self.nt, R, St, chain)
-                            # если цепочка b пуста или в S(b) есть пустая строка,
-                            # то добавить к S(b) S(X)
-                            if not chain or '' in s:
-                                s |= S[r.left]
-                            # удалить пустую цепочку, если она там есть
-                            s -= {''}
-                            # произошли изменения
-                            if not s <= S[n]:
-                                new = True
-                            # объединить со старым множеством
-                            curS[n] |= s
-            S = curS
-        return S
+        N = self.nt
+        F = self.left_sets(R, St)
+        # у стартового нетерминала есть символ конца цепочки (None)
+        base = {n: set() for n in N}
+        base[R[0].left].add(None)
+        deps = {n: set() for n in N}
+        for r in R:
+            for i, n in enumerate(r.right):
+                if n not in N:
+                    continue
+                # правило вида X -: a n b, вычислить S(b)
+                chain = r.right[i+1:]
+                s = S_chain(N, F, chain)
+                # если цепочка b пуста или в S(b) есть пустая строка,
+                # то S(n) включает S(X)
+                if not chain or '' in s:
+                    deps[n].add(r.left)
+                base[n] |= s - {''}
+        return closure(base, deps)
 
     def term_sets(self, R, St, Fo):
         # извлечь из каждого множества стартовых символов пустую строку
@@ -251,6 +358,12 @@ class GrammarParser:
         Ml = set(r.nleft for r in R)
         # множество индексов крайних правых частей
         Mr = set(r.nright+len(r.right)-1 for r in R)
+        # стартовые символы нетерминалов
+        F = self.left_sets(R, St)
+        # первое правило для каждого нетерминала слева
+        first_rule = {}
+        for r in R:
+            first_rule.setdefault(r.left, r)
         # таблица
         table = [TableRow() for i in range(max(Mr)+1)]
         for i, r in enumerate(R):
@@ -282,7 +395,7 @@ class GrammarParser:
                 # нетерминал
                 else:
                     chain = r.right[k:]
-                    S = S_chain(self.nt, R, St, chain)
+                    S = S_chain(self.nt, F, chain)
                     if '' in S:
                         S |= Fo[r.left]
                     S -= {''}
@@ -295,11 +408,8 @@ class GrammarParser:
                     table[n+k].jump = n+k+1 if n+k not in Mr else -1
                 # нетерминал
                 else:
-                    # ищем первое правило с этим нетерминалом слева
-                    for j, r2 in enumerate(R):
-                        if r2.left == tk:
-                            table[n+k].jump = r2.nleft
-                            break
+                    # первое правило с этим нетерминалом слева
+                    table[n+k].jump = first_rule[tk].nleft
                 
                 # терминалы и множества терминалов
                 table[n+k].accept = tk and tk not in self.nt
@@ -317,9 +427,246 @@ class GrammarParser:
                 t.terminals -= {None}
                 t.terminals.add('')
 
-    # разбор потока лексем
+    # для первой строки левых частей каждого нетерминала построить
+    # отображение направляющих символов в строки альтернатив
+    # (строки левых частей нетерминала идут подряд до строки с error)
+    # грамматика LL(1), поэтому множества альтернатив не пересекаются,
+    # и альтернатива выбирается одним поиском вместо перебора строк
+    # при пересечении выбирается первая подходящая строка, как при переборе
+    def predict_maps(self, R):
+        table = self.table
+        # строки, на которые выполняется переход к нетерминалу:
+        # левые части первых правил нетерминалов
+        seen = set()
+        for r in R:
+            if r.left in seen:
+                continue
+            seen.add(r.left)
+            predict = {}
+            k = r.nleft
+            while True:
+                for a in table[k].terminals:
+                    predict.setdefault(a, k)
+                if table[k].error:
+                    break
+                k += 1
+            table[r.nleft].predict = predict
+
+    # пронумеровать нетерминалы (symbols -- имена по номерам)
+    # и отметить строки левых частей номерами нетерминалов
+    # (left_symbols; -1 -- строка не левой части)
+    # строки без действий с нетерминалом Y в конце правила нетерминала X,
+    # из которого через нетерминалы в конце правил снова достижим X
+    # (правая рекурсия), отмечаются номером X (tail_symbols, см. iterparse)
+    def symbol_rows(self, R):
+        self.symbols: List[str] = []
+        ids: Dict[str, int] = {}
+        self.left_symbols = array('i', [-1]) * len(self.table)
+        self.tail_symbols = array('i', [-1]) * len(self.table)
+        # нетерминалы в конце правил каждого нетерминала
+        tails: Dict[str, Set[str]] = {}
+        for r in R:
+            if r.left not in ids:
+                ids[r.left] = len(self.symbols)
+                self.symbols.append(r.left)
+            self.left_symbols[r.nleft] = ids[r.left]
+            tails.setdefault(r.left, set())
+            if r.right[-1] in self.nt:
+                tails[r.left].add(r.right[-1])
+        for r in R:
+            Y = r.right[-1]
+            k = r.nright + len(r.right) - 1
+            if Y not in self.nt or self.table[k].action:
+                continue
+            # нетерминалы, достижимые из Y через нетерминалы в конце правил
+            seen = {Y}
+            work = [Y]
+            while work and r.left not in seen:
+                for Z in tails.get(work.pop(), ()):
+                    if Z not in seen:
+                        seen.add(Z)
+                        work.append(Z)
+            if r.left in seen:
+                self.tail_symbols[k] = ids[r.left]
+
+    # разбор потока лексем по скомпилированной таблице (см. CompiledTable)
+    # token_stream -- поток лексем/символов
+    # либо побайтовый источник (bytes, mmap, memoryview) в UTF-8
+    # результаты и вызовы диспетчера совпадают с parse_reference
+    # стек возвратов и стек отложенных действий -- заранее выделенные
+    # массивы целых чисел: кадр стека возвратов хранит строку возврата
+    # и начало своих действий в стеке действий, так что при разборе
+    # не создаются кортежи и списки
     def parse(self, token_stream):
+        dispatcher = self.dispatcher
+        dispatcher.reset()
+        if is_buffer(token_stream):
+            dispatcher.bind(token_stream)
+            token_stream = iter_chars(token_stream)
+        T = self.compiled
+        steps = T.steps
+        names = T.action_names
+        lookup = T.classes.get
+        ACCEPT = T.ACCEPT
+        SHIFT = T.ACCEPT | T.STACK
+        # стек возвратов: смещения строк возврата и начала действий кадров
+        size = self.STACK_SIZE
+        returns = array('i', [0]) * size
+        bases = array('i', [0]) * size
+        # стек отложенных действий
+        pending = array('I', [0]) * size
+        # вершины стеков (кадр 0 -- возврат из разбора)
+        depth = 0
+        top = 0
+        returns[0] = T.NONE
+        it = iter(HaltIterable(token_stream))
+        token = next(it)
+        c = lookup(token, 0)
+        # смещение текущей строки
+        tab = 0
+        while True:
+            step = steps[tab + c]
+            if step is None:
+                break
+            f, A, jump, resume = step
+            if f & ACCEPT:
+                # выполнить действие над терминалом
+                if A and not dispatcher(names[A], token):
+                    return False
+                token = next(it)
+                c = lookup(token, 0)
+            elif f:
+                # положить на стек строку возврата (следующую за текущей);
+                # первое действие кадра -- действие текущей строки
+                depth += 1
+                if depth == len(returns):
+                    returns.extend(returns)
+                    bases.extend(bases)
+                returns[depth] = resume
+                bases[depth] = top
+            if jump >= 0:
+                # действие нетерминала, левой части или пустой строки
+                # выполняется при возврате из кадра на вершине стека
+                if A and not f & ACCEPT:
+                    if top == len(pending):
+                        pending.extend(pending)
+                    pending[top] = A
+                    top += 1
+                tab = jump
+                continue
+            # выполнить действие для пустой строки
+            if A and not f & SHIFT and not dispatcher(names[A], token):
+                return False
+            # снять кадр со стека и выполнить его действия
+            # в порядке, обратном порядку размещения
+            tab = returns[depth]
+            base = bases[depth]
+            depth -= 1
+            while top > base:
+                top -= 1
+                if not dispatcher(names[pending[top]], token):
+                    return False
+            if tab < 0:
+                break
+        return not token and depth < 0
+
+    # разбор потока лексем без диспетчера: генератор событий разбора
+    # token_stream -- поток лексем/символов
+    # либо побайтовый источник (bytes, mmap, memoryview) в UTF-8
+    # события -- кортежи (событие, номер, номер лексемы):
+    # ENTER, EXIT -- начало и конец нетерминала (номер в symbols),
+    # TERMINAL -- принятая лексема (номер класса в compiled.classes),
+    # ACTION -- действие (номер в compiled.action_names),
+    # ERROR -- ошибка разбора (номер класса лексемы), последнее событие
+    # номер лексемы -- номер текущей лексемы потока; у EXIT это номер
+    # лексемы после нетерминала, у ACTION -- лексемы, с которой
+    # parse вызвал бы диспетчер
+    # действия следуют в том же порядке, в каком их выполняет parse;
+    # конец нетерминала выдается после действий, отложенных им
+    # до снятия кадра со стека
+    # правая рекурсия (например, список объявлений
+    # NS_BODY -: NS_ELEMENT REST_NS, REST_NS -: NS_BODY | $)
+    # разворачивается в последовательность соседних нетерминалов:
+    # конец нетерминала, который не отложил действий, выдается
+    # при переходе к нетерминалу правой рекурсии в конце его правила
+    # (см. symbol_rows), поэтому стек разбора на таких списках не растет
+    def iterparse(self, token_stream) -> Iterator[Tuple[int, int, int]]:
+        if is_buffer(token_stream):
+            token_stream = iter_chars(token_stream)
+        T = self.compiled
+        C = T.n_classes
+        select = T.select
+        jumps = T.jumps
+        flags = T.flags
+        actions = T.actions
+        lefts = self.left_symbols
+        tails = self.tail_symbols
+        lookup = T.classes.get
+        ENTER, EXIT, TERMINAL, ACTION = self.ENTER, self.EXIT, self.TERMINAL, self.ACTION
+        # стек возвратов: строки возврата и начала кадров в стеке
+        # отложенных действий; в стеке действий концы нетерминалов
+        # хранятся как ~номер нетерминала
+        returns = [-1]
+        bases = [0]
+        pending: List[int] = []
+        it = iter(HaltIterable(token_stream))
+        token = next(it)
+        c = lookup(token, 0)
+        index = 0
+        tab = 0
+        while True:
+            k = select[tab * C + c]
+            if k < 0:
+                yield self.ERROR, c, index
+                return
+            f = flags[k]
+            A = actions[k]
+            X = lefts[k]
+            if X >= 0:
+                yield ENTER, X, index
+                pending.append(~X)
+            elif tails[k] >= 0 and pending[-1] == ~tails[k]:
+                # конец нетерминала перед правой рекурсией
+                pending.pop()
+                yield EXIT, tails[k], index
+            if f & T.ACCEPT:
+                yield TERMINAL, c, index
+                if A:
+                    yield ACTION, A, index
+                token = next(it)
+                c = lookup(token, 0)
+                index += 1
+            elif f & T.STACK:
+                returns.append(k + 1)
+                bases.append(len(pending))
+            if jumps[k] >= 0:
+                if A and not f & T.ACCEPT:
+                    pending.append(A)
+                tab = jumps[k]
+                continue
+            if A and not f & (T.ACCEPT | T.STACK):
+                yield ACTION, A, index
+            tab = returns.pop()
+            base = bases.pop()
+            while len(pending) > base:
+                a = pending.pop()
+                if a < 0:
+                    yield EXIT, ~a, index
+                else:
+                    yield ACTION, a, index
+            if tab < 0:
+                break
+        if token:
+            yield self.ERROR, c, index
+
+    # разбор потока лексем по строкам таблицы (TableRow)
+    # token_stream -- поток лексем/символов
+    # либо побайтовый источник (bytes, mmap, memoryview) в UTF-8
+    def parse_reference(self, token_stream):
         self.dispatcher.reset()
+        if is_buffer(token_stream):
+            self.dispatcher.bind(token_stream)
+            token_stream = iter_chars(token_stream)
         # стек с возвратами и действиями при возврате
         stk = []
         s = HaltIterable(token_stream)
@@ -371,7 +718,15 @@ class GrammarParser:
                     continue
 
             elif not t.error:
-                tab += 1
+                # первая альтернатива нетерминала не подходит:
+                # выбрать альтернативу по лексеме одним поиском
+                predict = t.predict
+                if predict is None:
+                    tab += 1
+                    continue
+                tab = predict.get(token, -1)
+                if tab < 0:
+                    break
             else:
                 break
         return not token and not stk
@@ -0,0 +1,83 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+# скомпилированная таблица разбора LL(1)-анализатора
+# строки таблицы (TableRow) хранятся столбцами в массивах целых чисел:
+# переходы, признаки и номера действий
+# терминалы пронумерованы: терминалы, по которым строки выбираются
+# одинаково, объединены в один класс (класс 0 -- лексемы,
+# не входящие ни в одно множество направляющих символов)
+# выбор строки по классу лексемы хранится в плоском массиве select:
+# select[i * n_classes + c] -- строка, которая обрабатывается, если
+# разбор находится в строке i, а текущая лексема имеет класс c,
+# то есть первая строка начиная с i, в множестве которой есть лексема
+# (перебор идет по строкам без признака error, как при разборе
+# по строкам таблицы), либо NONE
+# при разборе строки представлены смещениями в select (i * n_classes),
+# а шаги разбора берутся из списка steps (см. __init__)
+class CompiledTable:
+    # отсутствие строки
+    NONE = -1
+    # признаки строки
+    ACCEPT = 1
+    STACK = 2
+
+    # rows -- строки таблицы разбора (GrammarParser.table)
+    def __init__(self, rows):
+        n = len(rows)
+        # имена действий, отсутствию действия соответствует номер 0
+        self.action_names: List[str] = ['']
+        action_ids: Dict[str, int] = {'': 0}
+        self.jumps = array('i', (t.jump for t in rows))
+        self.flags = array('B', ((self.ACCEPT if t.accept else 0) |
+                                 (self.STACK if t.stack else 0) for t in rows))
+        self.actions = array('I')
+        for t in rows:
+            A = t.action or ''
+            if A not in action_ids:
+                action_ids[A] = len(self.action_names)
+                self.action_names.append(A)
+            self.actions.append(action_ids[A])
+
+        # столбцы выбора строк для терминалов: строка -> выбранная строка
+        # строки с терминалом выбирают себя, предшествующие им строки
+        # без признака error (альтернативы того же нетерминала) --
+        # ближайшую из них
+        columns: Dict[str, Dict[int, int]] = dict()
+        for k, t in enumerate(rows):
+            for a in t.terminals:
+                column = columns.setdefault(a, dict())
+                column[k] = k
+                i = k - 1
+                while i >= 0 and not rows[i].error and a not in rows[i].terminals:
+                    column[i] = k
+                    i -= 1
+
+        # терминалы с одинаковыми столбцами объединяются в один класс
+        signatures: Dict[Tuple[Tuple[int, int], ...], int] = {(): 0}
+        self.classes: Dict[str, int] = dict()
+        for a, column in columns.items():
+            sig = tuple(sorted(column.items()))
+            self.classes[a] = signatures.setdefault(sig, len(signatures))
+        self.n_classes: int = len(signatures)
+        self.select = array('i', [self.NONE]) * (n * self.n_classes)
+        for sig, c in signatures.items():
+            for i, k in sig:
+                self.select[i * self.n_classes + c] = k
+
+        # шаги разбора для цикла GrammarParser.parse:
+        # steps[i * n_classes + c] -- кортеж (признаки, действие,
+        # смещение строки перехода либо NONE, смещение следующей строки)
+        # выбранной строки либо None (кортеж строки общий для всех
+        # элементов, выбирающих ее)
+        C = self.n_classes
+        rows_steps = [(self.flags[k], self.actions[k],
+                       self.jumps[k] * C if self.jumps[k] >= 0 else self.NONE,
+                       (k + 1) * C) for k in range(n)]
+        self.steps: List[Optional[Tuple[int, int, int, int]]] = [
+            rows_steps[k] if k >= 0 else None for k in self.select]
+
+    # класс лексемы token
+    def lookup(self, token: str) -> int:
+        return self.classes.get(token, 0)
@@ -1,6 +1,7 @@
 from .interface import LRActionDispatcher
 from .dispatcher import Rule, Dispatcher
 from ..automata import Automaton
+from ..automata.source import is_buffer, iter_chars
 import pathlib
 from typing import List, Set, Dict, Tuple, Iterator, Iterable, Optional, FrozenSet
 from functools import reduce
@@ -273,6 +274,10 @@ class GrammarParser:
         gstk: List[FrozenSet[str]] = []
 
         self.disp.reset()
+        # побайтовый источник разбирается без декодирования целиком
+        if is_buffer(s):
+            self.disp.bind(s)
+            s = iter_chars(s)
         it = iter(HaltIterable(s))
         t = next(it)
 